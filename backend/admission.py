@@ -0,0 +1,214 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """
+        Takes one token. Returns 0 on success, otherwise the number of seconds
+        until a token becomes available (nothing is taken in that case).
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Gives back a token taken for a request that was then turned away."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    """
+    Admission control for expensive requests, keyed on the user id.
+
+    - Each user is rate limited by a token bucket and may only run
+      `per_user` requests at the same time.
+    - At most `global_slots` requests run at once across all users. Extra
+      requests wait in a bounded queue (`queue_size`) that is drained
+      round-robin across users, so one user's batch upload cannot starve
+      everyone else.
+    - A user may have at most `per_user_queue` requests waiting. When the
+      queue is full, the newest request of the user with the longest queue
+      is shed to make room for a user with fewer waiting.
+    - When the bucket is empty or the queue is full the request is shed with
+      a 429 and a `Retry-After` header instead of piling up. Shed requests
+      get their rate-limit token back.
+
+    Limits are per worker process.
+    """
+
+    def __init__(self, global_slots: int, per_user: int, queue_size: int,
+                 rate_per_minute: float, burst: int, per_user_queue: int = 4):
+        self.global_slots = global_slots
+        self.per_user = per_user
+        self.queue_size = queue_size
+        self.per_user_queue = per_user_queue
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+
+        self.active = 0
+        self.active_by_user: dict[str, int] = {}
+        # Idle buckets refill completely within the TTL, so dropping them is safe
+        self.buckets: TTLCache = TTLCache(maxsize=10000, ttl=3600)
+        # uid -> deque of futures; insertion order is the round-robin order
+        self.waiting: "OrderedDict[str, deque[asyncio.Future]]" = OrderedDict()
+        self.queued = 0
+
+    def _rejection(self, retry_after: float, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def _reject(self, retry_after: float, detail: str):
+        raise self._rejection(retry_after, detail)
+
+    def _can_run(self, uid: str) -> bool:
+        return (self.active < self.global_slots
+                and self.active_by_user.get(uid, 0) < self.per_user)
+
+    def _start(self, uid: str):
+        self.active += 1
+        self.active_by_user[uid] = self.active_by_user.get(uid, 0) + 1
+
+    def _dispatch(self):
+        """Hands free slots to waiting users, one request per user per pass."""
+        progressed = True
+        while progressed and self.active < self.global_slots and self.waiting:
+            progressed = False
+            for uid in list(self.waiting):
+                if self.active >= self.global_slots:
+                    break
+                if not self._can_run(uid):
+                    continue
+                queue = self.waiting[uid]
+                fut = queue.popleft()
+                self.queued -= 1
+                # Move this user to the back of the rotation
+                del self.waiting[uid]
+                if queue:
+                    self.waiting[uid] = queue
+                progressed = True
+                if fut.cancelled():
+                    continue
+                self._start(uid)
+                fut.set_result(None)
+
+    def release(self, uid: str):
+        self.active -= 1
+        self.active_by_user[uid] -= 1
+        if not self.active_by_user[uid]:
+            del self.active_by_user[uid]
+        self._dispatch()
+
+    def _dequeue(self, uid: str, fut: asyncio.Future):
+        queue = self.waiting.get(uid)
+        if queue is not None and fut in queue:
+            queue.remove(fut)
+            self.queued -= 1
+            if not queue:
+                del self.waiting[uid]
+
+    def _refund(self, uid: str):
+        bucket = self.buckets.get(uid)
+        if bucket is not None:
+            bucket.refund()
+
+    def _shed_longest(self, uid: str) -> bool:
+        """
+        Makes room in a full queue by shedding the newest request of the user
+        with the longest queue, if that queue is longer than `uid`'s.
+        """
+        victim_uid = max(self.waiting, key=lambda u: len(self.waiting[u]))
+        if victim_uid == uid or len(self.waiting[victim_uid]) <= len(self.waiting[uid]):
+            return False
+        queue = self.waiting[victim_uid]
+        victim = queue.pop()
+        self.queued -= 1
+        if not queue:
+            del self.waiting[victim_uid]
+        if not victim.done():
+            self._refund(victim_uid)
+            victim.set_exception(self._rejection(self._estimated_wait(), "Server is busy. Please try again shortly."))
+        return True
+
+    def _estimated_wait(self) -> float:
+        # Rough guess for Retry-After: one bucket interval per queued request
+        # spread over the available slots.
+        return (self.queued + 1) / max(self.global_slots, 1) / max(self.rate, 1e-6)
+
+    async def acquire(self, uid: str):
+        """Waits for an execution slot for `uid`, or raises a 429. Pair with release()."""
+        bucket = self.buckets.get(uid)
+        if bucket is None:
+            bucket = self.buckets[uid] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait:
+            self._reject(wait, "Too many analysis requests. Please slow down.")
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(uid, deque()).append(fut)
+        self.queued += 1
+        self._dispatch()
+        if fut.done():
+            return
+        if len(self.waiting[uid]) > self.per_user_queue:
+            self._dequeue(uid, fut)
+            bucket.refund()
+            self._reject(self._estimated_wait(), "Too many of your requests are waiting. Please try again shortly.")
+        if self.queued > self.queue_size and not self._shed_longest(uid):
+            self._dequeue(uid, fut)
+            bucket.refund()
+            self._reject(self._estimated_wait(), "Server is busy. Please try again shortly.")
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was granted just as we were cancelled; hand it back.
+                self.release(uid)
+            else:
+                self._dequeue(uid, fut)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, uid: str):
+        """Waits for an execution slot for `uid`, or raises a 429."""
+        await self.acquire(uid)
+        try:
+            yield
+        finally:
+            self.release(uid)
+
+
+analysis_admission = AdmissionController(
+    global_slots=int(os.getenv("ANALYZE_MAX_CONCURRENCY", "8")),
+    per_user=int(os.getenv("ANALYZE_PER_USER_CONCURRENCY", "2")),
+    queue_size=int(os.getenv("ANALYZE_QUEUE_SIZE", "32")),
+    rate_per_minute=float(os.getenv("ANALYZE_RATE_PER_MINUTE", "10")),
+    burst=int(os.getenv("ANALYZE_RATE_BURST", "5")),
+    per_user_queue=int(os.getenv("ANALYZE_PER_USER_QUEUE", "4")),
+)
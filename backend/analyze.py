@@ -1,4 +1,12 @@
 import re
+from collections import deque
+
+FILLERS = {"um", "uh", "like", "you know", "so", "actually", "basically", "i mean", "sort of", "kind of"}
+
+
+def normalize_word(text: str) -> str:
+    return re.sub(r'[^a-zA-Z]', '', text.lower())
+
 
 def calc_wpm(transcription: dict) -> int:
     words = transcription['words']
@@ -8,18 +16,17 @@ def calc_wpm(transcription: dict) -> int:
     return wpm
 
 def check_fillers(transcription: dict) -> dict:
-    fillers = {"um", "uh", "like", "you know", "so", "actually", "basically", "i mean", "sort of", "kind of"}
     filler_count = {}
-    lwords = [re.sub(r'[^a-zA-Z]', '', w['text'].lower()) for w in transcription['words']]
+    lwords = [normalize_word(w['text']) for w in transcription['words']]
 
     for i in range(len(lwords)):
         single = lwords[i]
 
-        if single in fillers:
+        if single in FILLERS:
             filler_count[single] = filler_count.get(single, 0) + 1
 
         pair = f"{single} {lwords[i+1]}" if (i+1) < len(lwords) else None
-        if pair in fillers:
+        if pair in FILLERS:
             filler_count[pair] = filler_count.get(pair, 0) + 1
 
     return filler_count
@@ -36,3 +43,71 @@ def calc_confidence(transcription: dict) -> float:
     words = transcription['words']
     total_confidence = sum(words['confidence'] for words in transcription['words']) / len(words)
     return round(total_confidence, 2)
+
+
+class LiveMetrics:
+    """
+    Incremental pace/filler/confidence metrics over a sliding time window,
+    for live coaching.
+
+    Unlike calc_wpm/check_fillers, which rescan the whole word list, each
+    word is added once and evicted once, so an update costs O(new words).
+    Filler counting matches check_fillers: a two-word filler is attributed
+    to its second word.
+    """
+
+    def __init__(self, window_ms: float = 30000):
+        self.window_ms = window_ms
+        self.window = deque()  # (start, end, confidence, fillers)
+        self.window_fillers = {}
+        self.window_confidence = 0.0
+        self.total_fillers = {}
+        self.total_words = 0
+        self.prev_word = None
+
+    def add_words(self, words: list):
+        for w in words:
+            self._add(w)
+        self._evict()
+
+    def _add(self, w: dict):
+        word = normalize_word(w['text'])
+        fillers = []
+        if word in FILLERS:
+            fillers.append(word)
+        if self.prev_word is not None and f"{self.prev_word} {word}" in FILLERS:
+            fillers.append(f"{self.prev_word} {word}")
+        self.prev_word = word
+
+        self.window.append((w['start'], w['end'], w['confidence'], fillers))
+        self.window_confidence += w['confidence']
+        self.total_words += 1
+        for f in fillers:
+            self.window_fillers[f] = self.window_fillers.get(f, 0) + 1
+            self.total_fillers[f] = self.total_fillers.get(f, 0) + 1
+
+    def _evict(self):
+        if not self.window:
+            return
+        cutoff = self.window[-1][1] - self.window_ms
+        while self.window and self.window[0][1] < cutoff:
+            _, _, confidence, fillers = self.window.popleft()
+            self.window_confidence -= confidence
+            for f in fillers:
+                self.window_fillers[f] -= 1
+                if not self.window_fillers[f]:
+                    del self.window_fillers[f]
+
+    def snapshot(self) -> dict:
+        count = len(self.window)
+        span_ms = self.window[-1][1] - self.window[0][0] if count else 0
+        wpm = round(count / (span_ms / 60000)) if span_ms > 0 else 0
+        confidence = round(self.window_confidence / count, 2) if count else 0.0
+        return {
+            "wpm": wpm,
+            "pace_feedback": pace_feedback(wpm) if count else None,
+            "filler_count": dict(self.window_fillers),
+            "total_filler_count": dict(self.total_fillers),
+            "clarity_score": confidence * 10,
+            "word_count": self.total_words,
+        }
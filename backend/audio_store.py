@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Audio larger than this always goes to disk; smaller files go to tmpfs
+# (memory-backed) when available. Docker gives /dev/shm only 64MB by default.
+AUDIO_SPOOL_MAX_BYTES = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+AUDIO_SPOOL_DIR = os.getenv("AUDIO_SPOOL_DIR", "/dev/shm/speechscore-audio")
+AUDIO_STORE_DIR = os.getenv("AUDIO_STORE_DIR", "temp/audio")
+# Unreferenced files older than this are deleted by the janitor. Files of
+# other live workers are only deleted after AUDIO_ORPHAN_TTL.
+AUDIO_ORPHAN_GRACE = int(os.getenv("AUDIO_ORPHAN_GRACE", "60"))
+AUDIO_ORPHAN_TTL = int(os.getenv("AUDIO_ORPHAN_TTL", "21600"))
+AUDIO_JANITOR_INTERVAL = int(os.getenv("AUDIO_JANITOR_INTERVAL", "300"))
+
+
+def _suffix(filename: str) -> str:
+    # Keep a plain extension (".webm", ".mp3") so ffmpeg and the SDKs can
+    # sniff the format; never let the client's name into the path otherwise.
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists but belongs to someone else
+    return True
+
+
+class AudioStore:
+    """
+    Temporary storage for uploaded audio while it is being analyzed.
+
+    Files are named by the SHA-256 of their contents, so concurrent uploads
+    never overwrite each other and identical uploads share one file.
+    Each `put` takes a reference and each `release` drops one; the file is
+    deleted when the last reference goes. Writes go to a unique temp name
+    and are renamed into place, so a reader never sees a partial file.
+
+    Reference counts live in this process, so each worker gets its own
+    subdirectory (named by pid). The janitor removes what a crashed worker
+    left behind.
+    """
+
+    def __init__(self, disk_dir: Path, spool_dir: Path, spool_max_bytes: int):
+        self.disk_root = disk_dir
+        self.spool_root = spool_dir
+        self.spool_max_bytes = spool_max_bytes
+        self._refs: dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def _worker_dir(self, root: Path) -> Path:
+        return root / str(os.getpid())
+
+    def _target_dir(self, size: int) -> Path:
+        if size <= self.spool_max_bytes:
+            try:
+                spool = self._worker_dir(self.spool_root)
+                spool.mkdir(parents=True, exist_ok=True)
+                # Leave headroom so a full tmpfs doesn't fail other writers
+                if shutil.disk_usage(spool).free > 2 * size:
+                    return spool
+            except OSError:
+                pass  # No tmpfs here; fall back to disk
+        disk = self._worker_dir(self.disk_root)
+        disk.mkdir(parents=True, exist_ok=True)
+        return disk
+
+    def put(self, contents: bytes, filename: str = "", digest: Optional[str] = None) -> Path:
+        """
+        Stores `contents` and returns its path, holding one reference to it.
+        Pass `digest` (the SHA-256 hex of `contents`) if already computed.
+        """
+        digest = digest or hashlib.sha256(contents).hexdigest()
+        path = self._target_dir(len(contents)) / f"{digest}{_suffix(filename)}"
+
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + 1
+        # While we hold a reference nobody deletes the file, so if it exists
+        # it is complete. Concurrent writers of the same content are harmless.
+        if not path.exists():
+            tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(contents)
+                os.replace(tmp, path)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                self.release(path)
+                raise
+        return path
+
+    def release(self, path: Path):
+        with self._lock:
+            count = self._refs.get(path, 0) - 1
+            if count > 0:
+                self._refs[path] = count
+                return
+            self._refs.pop(path, None)
+            # Unlink under the lock so a concurrent put can't reuse the file
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @asynccontextmanager
+    async def stored(self, contents: bytes, filename: str = "", digest: Optional[str] = None):
+        """Stores `contents` for the duration of the block and yields its path."""
+        path = await run_in_threadpool(self.put, contents, filename, digest)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def sweep_orphans(self) -> int:
+        """Deletes files no live request references. Returns how many were removed."""
+        now = time.time()
+        own_pid = str(os.getpid())
+        removed = 0
+        for root in (self.disk_root, self.spool_root):
+            if not root.is_dir():
+                continue
+            for worker_dir in root.iterdir():
+                if not worker_dir.is_dir():
+                    continue
+                if worker_dir.name != own_pid and worker_dir.name.isdigit() \
+                        and not _pid_alive(int(worker_dir.name)):
+                    removed += sum(1 for _ in worker_dir.iterdir())
+                    shutil.rmtree(worker_dir, ignore_errors=True)
+                    continue
+                for path in worker_dir.iterdir():
+                    try:
+                        age = now - path.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    if worker_dir.name == own_pid:
+                        with self._lock:
+                            orphan = path not in self._refs and age > AUDIO_ORPHAN_GRACE
+                            if orphan:
+                                path.unlink(missing_ok=True)
+                    else:
+                        orphan = age > AUDIO_ORPHAN_TTL
+                        if orphan:
+                            path.unlink(missing_ok=True)
+                    removed += orphan
+        return removed
+
+
+audio_store = AudioStore(
+    disk_dir=Path(AUDIO_STORE_DIR),
+    spool_dir=Path(AUDIO_SPOOL_DIR),
+    spool_max_bytes=AUDIO_SPOOL_MAX_BYTES,
+)
+
+
+async def run_audio_janitor():
+    """Background loop started from the app lifespan."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(audio_store.sweep_orphans)
+            if removed:
+                logger.info(f"Audio janitor removed {removed} orphaned file(s)")
+        except Exception as e:
+            logger.error(f"Audio janitor failed: {e}", exc_info=True)
+        await asyncio.sleep(AUDIO_JANITOR_INTERVAL)
@@ -0,0 +1,62 @@
+"""
+Benchmark for rubric scoring latency vs. speech length.
+
+Replaces the Gemini client with a fake whose latency grows with prompt
+size (a rough stand-in for the real API), then times `gemini_output` with
+and without the map-reduce long-transcript mode.
+
+Usage: python bench_scoring.py
+"""
+import time
+import typing
+
+from pydantic import BaseModel
+
+import gemini
+
+# Fake latency model: fixed overhead + per-character cost of the prompt
+BASE_LATENCY = 0.3
+SECONDS_PER_CHAR = 1 / 40000
+
+
+def _dummy(annotation):
+    origin = typing.get_origin(annotation)
+    if origin is list:
+        return [_dummy(typing.get_args(annotation)[0])]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation(**{name: _dummy(f.annotation) for name, f in annotation.model_fields.items()})
+    return "x" if annotation is str else annotation(1)
+
+
+class FakeModels:
+    def generate_content(self, model, contents, config=None):
+        prompt = contents[0]
+        time.sleep(BASE_LATENCY + len(prompt) * SECONDS_PER_CHAR)
+        return type("Response", (), {"parsed": _dummy(config["response_schema"])})()
+
+
+def transcript_of(minutes: int) -> str:
+    # ~140 wpm, ~6 chars per word
+    words = minutes * 140
+    return " ".join("This is a sentence of the speech." for _ in range(words // 7))
+
+
+if __name__ == "__main__":
+    gemini.client.models = FakeModels()
+    rubric = "Evaluate based on clarity, pacing and structure."
+
+    print(f"{'minutes':>8} {'chars':>8} {'single (s)':>11} {'map-reduce (s)':>15}")
+    for minutes in (5, 15, 30, 60, 120):
+        text = transcript_of(minutes)
+
+        gemini.LONG_TRANSCRIPT_CHARS = float("inf")
+        start = time.perf_counter()
+        gemini.gemini_output(text, "Practice speech", rubric)
+        single = time.perf_counter() - start
+
+        gemini.LONG_TRANSCRIPT_CHARS = 0
+        start = time.perf_counter()
+        gemini.gemini_output(text, "Practice speech", rubric)
+        mapped = time.perf_counter() - start
+
+        print(f"{minutes:>8} {len(text):>8} {single:>11.2f} {mapped:>15.2f}")
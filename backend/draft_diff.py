@@ -0,0 +1,222 @@
+from analyze import normalize_word
+
+# Edit scripts are lists of (op, a_start, a_end, b_start, b_end) with op in
+# "equal", "delete" (a[a_start:a_end] removed) and "insert" (b[b_start:b_end] added).
+
+# Inputs with more words than this (both drafts together) are split at
+# unique words before diffing
+ANCHOR_THRESHOLD = 2000
+# Myers' cost grows with the square of the number of edits. A region that
+# needs more edits than this is reported as one deletion plus one insertion.
+MAX_EDIT_DISTANCE = 500
+
+
+def _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi):
+    """
+    Finds the middle snake of the shortest edit script between a[a_lo:a_hi]
+    and b[b_lo:b_hi] (Myers 1986, section 4b), searching forward from the
+    start and backward from the end until the paths overlap.
+
+    Returns (x, y, u, v): the snake runs from (x, y) to (u, v) in absolute
+    indices, with a[x:u] == b[y:v]. Returns None if the edit script is longer
+    than MAX_EDIT_DISTANCE.
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    if max_d > MAX_EDIT_DISTANCE // 2 + 1:
+        # Each round d extends both searches, so D edits take about D/2 rounds
+        max_d = MAX_EDIT_DISTANCE // 2 + 1
+    # Diagonals k range over [-max_d - 1, max_d + 1]; negative indices wrap
+    # to the end of the lists, so the lists just need room for both halves.
+    size = 2 * max_d + 3
+    vf = [0] * size  # furthest x reached on forward diagonal k
+    vb = [0] * size  # furthest x reached (counted from the end) on backward diagonal k
+
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[k - 1] < vf[k + 1]):
+                x = vf[k + 1]
+            else:
+                x = vf[k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            vf[k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + vb[delta - k] >= n:
+                return a_lo + x0, b_lo + y0, a_lo + x, b_lo + y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[k - 1] < vb[k + 1]):
+                x = vb[k + 1]
+            else:
+                x = vb[k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            vb[k] = x
+            if not odd and -d <= delta - k <= d and x + vf[delta - k] >= n:
+                return a_hi - x, b_hi - y, a_hi - x0, b_hi - y0
+
+    if max_d < (n + m + 1) // 2:
+        return None
+    raise AssertionError("middle snake not found")
+
+
+def _diff(a, a_lo, a_hi, b, b_lo, b_hi, ops):
+    # Common prefix and suffix are cheap to peel off and very common between drafts
+    start = a_lo
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        a_lo += 1
+        b_lo += 1
+    if a_lo > start:
+        ops.append(("equal", start, a_lo, b_lo - (a_lo - start), b_lo))
+    end = a_hi
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+    suffix = ("equal", a_hi, end, b_hi, b_hi + (end - a_hi)) if end > a_hi else None
+
+    if a_lo == a_hi:
+        if b_lo < b_hi:
+            ops.append(("insert", a_lo, a_lo, b_lo, b_hi))
+    elif b_lo == b_hi:
+        ops.append(("delete", a_lo, a_hi, b_lo, b_lo))
+    else:
+        snake = _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi)
+        if snake is None:
+            # Too different to align cheaply: replace the whole region
+            ops.append(("delete", a_lo, a_hi, b_lo, b_lo))
+            ops.append(("insert", a_hi, a_hi, b_lo, b_hi))
+        else:
+            x, y, u, v = snake
+            _diff(a, a_lo, x, b, b_lo, y, ops)
+            if u > x:
+                ops.append(("equal", x, u, y, v))
+            _diff(a, u, a_hi, b, v, b_hi, ops)
+
+    if suffix:
+        ops.append(suffix)
+
+
+def _unique_anchors(a: list, b: list) -> list:
+    """
+    Pairs (i, j) of tokens that occur exactly once in each sequence, reduced
+    to the longest run that is increasing in both (as in patience diff).
+    """
+    count_a, pos_a = {}, {}
+    for i, t in enumerate(a):
+        count_a[t] = count_a.get(t, 0) + 1
+        pos_a[t] = i
+    count_b, pos_b = {}, {}
+    for j, t in enumerate(b):
+        count_b[t] = count_b.get(t, 0) + 1
+        pos_b[t] = j
+    pairs = sorted(
+        (pos_a[t], pos_b[t]) for t, c in count_a.items() if c == 1 and count_b.get(t) == 1
+    )
+
+    # Longest increasing subsequence of the b positions, O(P log P)
+    tails, tail_idx, prev = [], [], [None] * len(pairs)
+    for p, (_, j) in enumerate(pairs):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < j:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(j)
+            tail_idx.append(p)
+        else:
+            tails[lo] = j
+            tail_idx[lo] = p
+        prev[p] = tail_idx[lo - 1] if lo else None
+
+    anchors = []
+    p = tail_idx[-1] if tail_idx else None
+    while p is not None:
+        anchors.append(pairs[p])
+        p = prev[p]
+    anchors.reverse()
+    return anchors
+
+
+def diff_sequences(a: list, b: list) -> list:
+    """
+    Edit script from `a` to `b` using Myers' O(ND) algorithm in linear space.
+    Adjacent operations of the same kind are merged.
+
+    Myers is exact but its cost grows with the number of edits, so long,
+    heavily reworked drafts are first cut at words unique to both drafts
+    and each gap is diffed separately, and a gap needing more than
+    MAX_EDIT_DISTANCE edits is replaced wholesale. The script can then be
+    longer than the minimum, which doesn't matter for display.
+    """
+    ops = []
+    if len(a) + len(b) > ANCHOR_THRESHOLD:
+        a_lo = b_lo = 0
+        for i, j in _unique_anchors(a, b):
+            _diff(a, a_lo, i, b, b_lo, j, ops)
+            ops.append(("equal", i, i + 1, j, j + 1))
+            a_lo, b_lo = i + 1, j + 1
+        _diff(a, a_lo, len(a), b, b_lo, len(b), ops)
+    else:
+        _diff(a, 0, len(a), b, 0, len(b), ops)
+
+    merged = []
+    for op in ops:
+        if merged and merged[-1][0] == op[0] and merged[-1][2] == op[1] and merged[-1][4] == op[3]:
+            prev = merged[-1]
+            merged[-1] = (prev[0], prev[1], op[2], prev[3], op[4])
+        else:
+            merged.append(op)
+    return merged
+
+
+def _token(text: str) -> str:
+    # Compare words the way filler counting does, ignoring case and punctuation
+    return normalize_word(text) or text.lower()
+
+
+def diff_words(base_words: list, target_words: list) -> list:
+    """
+    Aligns two drafts' word lists (dicts with text/start/end) and returns
+    spans with word ranges, text and timestamps from the draft(s) they
+    belong to.
+    """
+    # Intern tokens to ints so the inner loop compares small ints, not strings
+    ids = {}
+    a = [ids.setdefault(_token(w['text']), len(ids)) for w in base_words]
+    b = [ids.setdefault(_token(w['text']), len(ids)) for w in target_words]
+
+    spans = []
+    for op, a_start, a_end, b_start, b_end in diff_sequences(a, b):
+        source = target_words[b_start:b_end] if op == "insert" else base_words[a_start:a_end]
+        span = {
+            "op": op,
+            "base_start": a_start,
+            "base_end": a_end,
+            "target_start": b_start,
+            "target_end": b_end,
+            "text": " ".join(w['text'] for w in source),
+            "base_start_ms": None,
+            "base_end_ms": None,
+            "target_start_ms": None,
+            "target_end_ms": None,
+        }
+        if a_end > a_start:
+            span["base_start_ms"] = base_words[a_start]['start']
+            span["base_end_ms"] = base_words[a_end - 1]['end']
+        if b_end > b_start:
+            span["target_start_ms"] = target_words[b_start]['start']
+            span["target_end_ms"] = target_words[b_end - 1]['end']
+        spans.append(span)
+    return spans
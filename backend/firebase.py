@@ -3,6 +3,7 @@ from firebase_admin import credentials, auth
 from fastapi import Header, HTTPException
 import os
 import json
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -65,3 +66,10 @@ async def get_current_user(authorization: str = Header(...)):
     except Exception as e:
         print(f"Token verification failed: {e}") # Print is captured by Railway logs
         raise HTTPException(status_code=401, detail="Invalid Firebase ID Token")
+
+
+async def get_optional_user(authorization: Optional[str] = Header(None)):
+    """Like get_current_user, but returns None for anonymous requests."""
+    if authorization is None:
+        return None
+    return await get_current_user(authorization)
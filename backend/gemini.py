@@ -2,27 +2,218 @@ from google import genai
 from pydantic import BaseModel
 from schemas import CoachRequest
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from model_router import model_router, estimate_tokens, rubric_tier, coach_tier
+from typing import Callable, Optional
+import logging
 import os
+import re
 
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 
 client = genai.Client(api_key = gemini_api_key)
 
+logger = logging.getLogger(__name__)
 
+# Transcripts longer than this are scored map-reduce style (segments in parallel)
+LONG_TRANSCRIPT_CHARS = int(os.getenv("GEMINI_LONG_TRANSCRIPT_CHARS", "12000"))
+# Target segment size for the map step
+SEGMENT_CHARS = int(os.getenv("GEMINI_SEGMENT_CHARS", "4000"))
+# Upper bound on concurrent segment calls for a single transcript
+MAX_PARALLEL_SEGMENTS = int(os.getenv("GEMINI_MAX_PARALLEL_SEGMENTS", "8"))
 
-def gemini_output(transcript_text: str, u_prompt: str, rubric: str):
-    class RubricItem(BaseModel):
-        criterion: str
-        score: float
-        max_score: float
 
-    class response_format(BaseModel):
-        strengths: list[str]
-        improvements: list[str]
-        rubric_scores: list[RubricItem]
-        rubric_total: float
-        rubric_max: float
+class RubricItem(BaseModel):
+    criterion: str
+    score: float
+    max_score: float
+
+
+class response_format(BaseModel):
+    strengths: list[str]
+    improvements: list[str]
+    rubric_scores: list[RubricItem]
+    rubric_total: float
+    rubric_max: float
+
+
+class CriterionNote(BaseModel):
+    criterion: str
+    observation: str
+    provisional_score: float
+    max_score: float
+
+
+class SegmentNotes(BaseModel):
+    summary: str
+    strengths: list[str]
+    improvements: list[str]
+    criterion_notes: list[CriterionNote]
+
+
+def _generate_structured(task: str, g_prompt: str, schema: type[BaseModel], min_tier: str,
+                         latency_budget_ms: Optional[float] = None,
+                         validate: Optional[Callable[[BaseModel], bool]] = None):
+    """
+    Runs a structured-output prompt on the routed model. Responses that do
+    not parse into `schema` (or fail `validate`) are retried on a stronger tier.
+    """
+    def generate(model: str):
+        response = client.models.generate_content(
+            model=model,
+            contents=[g_prompt],
+            config={
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+            },
+        )
+        return response.parsed
+
+    return model_router.call(
+        task,
+        estimate_tokens(g_prompt),
+        min_tier,
+        generate,
+        validate=lambda parsed: isinstance(parsed, schema) and (validate is None or validate(parsed)),
+        latency_budget_ms=latency_budget_ms,
+    )
+
+
+def _has_scores(parsed: response_format) -> bool:
+    return bool(parsed.rubric_scores) and parsed.rubric_max > 0
+
+
+def split_transcript(transcript_text: str, max_chars: int = SEGMENT_CHARS) -> list[str]:
+    """
+    Splits a transcript into segments of roughly `max_chars`, breaking at
+    sentence boundaries. A single sentence longer than `max_chars` is split
+    at word boundaries.
+    """
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", transcript_text.strip()) if s]
+    segments = []
+    current = ""
+    for sentence in sentences:
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces, piece = [], ""
+            for word in sentence.split():
+                if piece and len(piece) + len(word) + 1 > max_chars:
+                    pieces.append(piece)
+                    piece = word
+                else:
+                    piece = f"{piece} {word}" if piece else word
+            if piece:
+                pieces.append(piece)
+
+        for piece in pieces:
+            if current and len(current) + len(piece) + 1 > max_chars:
+                segments.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _merge_segments(segments: list[str], max_count: int) -> list[str]:
+    """Merges the shortest adjacent pair until at most `max_count` segments remain."""
+    segments = list(segments)
+    while len(segments) > max_count:
+        i = min(range(len(segments) - 1), key=lambda j: len(segments[j]) + len(segments[j + 1]))
+        segments[i:i + 2] = [f"{segments[i]} {segments[i + 1]}"]
+    return segments
+
+
+def _score_segment(index: int, count: int, segment: str, u_prompt: str, rubric: str,
+                   latency_budget_ms: Optional[float] = None) -> SegmentNotes:
+    g_prompt = f"""
+    You are an assistant that evaluates student presentations.
+    You are reading part {index + 1} of {count} of a longer transcript.
+
+    Transcript part:
+    {segment}
+
+    Task/Prompt:
+    {u_prompt}
+
+    Rubric:
+    {rubric}
+
+    Instructions:
+    1. Summarize what this part of the speech covers in 2-3 sentences.
+    2. For each rubric criterion, note concrete evidence from this part and a
+       provisional score with its maximum (respect maximums given in the rubric;
+       otherwise assume equal weighting out of 100 total).
+    3. List strengths and areas for improvement that are specific to this part.
+
+    Return the results strictly in the structured schema provided.
+    """
+
+    return _generate_structured("segment scoring", g_prompt, SegmentNotes, rubric_tier(rubric), latency_budget_ms)
+
+
+def _gemini_output_long(transcript_text: str, u_prompt: str, rubric: str, latency_budget_ms: Optional[float] = None):
+    """
+    Map-reduce scoring for long transcripts: segments are scored concurrently,
+    then a single reduce call turns the segment notes into the usual
+    `response_format`. Latency is roughly one segment call plus the reduce,
+    regardless of speech length: past MAX_PARALLEL_SEGMENTS segments, the
+    segments grow instead of queueing a second wave of calls.
+    """
+    segment_chars = max(SEGMENT_CHARS, -(-len(transcript_text) // MAX_PARALLEL_SEGMENTS))
+    # Sentence packing rarely fills segments exactly, so it can overshoot by a
+    # segment or two; merging keeps every call in the first wave
+    segments = _merge_segments(split_transcript(transcript_text, segment_chars), MAX_PARALLEL_SEGMENTS)
+    # The map and reduce stages run one after the other, so each gets half the budget
+    stage_budget_ms = latency_budget_ms / 2 if latency_budget_ms is not None else None
+    logger.info(f"Long transcript ({len(transcript_text)} chars): scoring {len(segments)} segments")
+
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_SEGMENTS, len(segments))) as pool:
+        notes = list(pool.map(
+            lambda args: _score_segment(args[0], len(segments), args[1], u_prompt, rubric, stage_budget_ms),
+            enumerate(segments),
+        ))
+
+    notes_text = "\n\n".join(
+        f"Part {i + 1} of {len(notes)}:\n{n.model_dump_json(indent=2)}" for i, n in enumerate(notes)
+    )
+
+    g_prompt = f"""
+    You are an assistant that evaluates student presentations.
+    The transcript was too long to read at once, so each part was reviewed
+    separately. Combine the part reviews below into one evaluation of the
+    whole speech.
+
+    Part reviews:
+    {notes_text}
+
+    Task/Prompt:
+    {u_prompt}
+
+    Rubric:
+    {rubric}
+
+    Instructions:
+    1. Assign one numeric score for each rubric criterion for the whole speech,
+       weighing the evidence from every part (do not simply add part scores).
+       - If the rubric specifies maximums, RESPECT THEM and extract the `max_score`.
+       - If no maximums are given, assume equal weighting out of 100 total (e.g. 5 criteria = 20 max each).
+    2. Provide specific strengths and areas for improvement as concise bullet-style items,
+       merging duplicates across parts.
+
+    Return the results strictly in the structured schema provided.
+    """
+
+    return _generate_structured(
+        "rubric reduce", g_prompt, response_format, rubric_tier(rubric), stage_budget_ms, _has_scores
+    )
+
+
+def gemini_output(transcript_text: str, u_prompt: str, rubric: str, latency_budget_ms: Optional[float] = None):
+    if len(transcript_text) > LONG_TRANSCRIPT_CHARS:
+        return _gemini_output_long(transcript_text, u_prompt, rubric, latency_budget_ms)
 
     # Prompt for Gemini
     g_prompt = f"""
@@ -50,17 +241,10 @@ def gemini_output(transcript_text: str, u_prompt: str, rubric: str):
     Return the results strictly in the structured schema provided.
     """
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[g_prompt],
-        config={
-        "response_mime_type": "application/json",
-        "response_schema": response_format,
-        },
+    return _generate_structured(
+        "rubric scoring", g_prompt, response_format, rubric_tier(rubric), latency_budget_ms, _has_scores
     )
 
-    return response.parsed
-
 
 def chat_with_coach(request: CoachRequest) -> str:
     """
@@ -120,12 +304,20 @@ def chat_with_coach(request: CoachRequest) -> str:
         # Better approach for stateless "history":
         full_contents = history_gemini + [current_turn]
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=full_contents,
+        def generate(model: str):
+            return client.models.generate_content(
+                model=model,
+                contents=full_contents,
+            ).text
+
+        return model_router.call(
+            "coach chat",
+            estimate_tokens(system_instruction, request.user_question, *(m.content for m in request.chat_history)),
+            coach_tier(request.user_question, len(request.chat_history)),
+            generate,
+            validate=lambda text: bool(text and text.strip()),
+            latency_budget_ms=request.latency_budget_ms,
         )
-        
-        return response.text
 
     except Exception as e:
         print(f"Gemini Coach Error: {e}")
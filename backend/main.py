@@ -2,11 +2,21 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from routers.analyze import router as analyze_router
 from routers.coach import router as coach_router
+from routers.uploads import router as uploads_router
+from routers.live import router as live_router
+from routers.rescore import router as rescore_router
+from routers.drafts import router as drafts_router
+from routers.search import router as search_router
+from routers.recordings import router as recordings_router
+from upload_sessions import run_upload_janitor
+from audio_store import run_audio_janitor
+from profiling import ProfilingMiddleware
 
 load_dotenv()
 
@@ -24,7 +34,12 @@ async def lifespan(app: FastAPI):
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
     
     logger.info("Environment variables verified.")
+
+    # Clean up abandoned resumable uploads and orphaned temp audio in the background
+    janitors = [asyncio.create_task(run_upload_janitor()), asyncio.create_task(run_audio_janitor())]
     yield
+    for janitor in janitors:
+        janitor.cancel()
 
 app = FastAPI(
     title="SpeechScore API",
@@ -33,6 +48,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Opt-in sampling profiler (PROFILE_TOKEN / PROFILE_SAMPLE_RATE), registered
+# before CORS so CORS stays the outermost middleware
+app.add_middleware(ProfilingMiddleware)
+
 # CORS configuration - supports both development and production
 allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173")
 # Split by comma and strip whitespace from each origin
@@ -50,6 +69,12 @@ app.add_middleware(
 # Include routers
 app.include_router(analyze_router)
 app.include_router(coach_router)
+app.include_router(uploads_router)
+app.include_router(live_router)
+app.include_router(rescore_router)
+app.include_router(drafts_router)
+app.include_router(search_router)
+app.include_router(recordings_router)
 
 # Root endpoint
 @app.get("/")
@@ -60,7 +85,13 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "health": "/api/health",
-            "analyze": "/api/analyze"
+            "analyze": "/api/analyze",
+            "rescore": "/api/rescore",
+            "drafts_diff": "/api/drafts/diff",
+            "search": "/api/search",
+            "recordings": "/api/recordings/{recording_id}",
+            "uploads": "/api/uploads",
+            "live": "/api/live/ws"
         }
     }
 
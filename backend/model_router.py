@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Tiers from fastest/cheapest to strongest. `expected_latency_ms` is only a
+# starting point; observed latency replaces it once calls have been made.
+# Override with GEMINI_MODEL_TABLE (a JSON list with the same keys).
+DEFAULT_MODEL_TABLE = [
+    {"tier": "fast", "model": "gemini-2.0-flash-lite", "max_input_tokens": 8000, "expected_latency_ms": 1500},
+    {"tier": "standard", "model": "gemini-2.0-flash", "max_input_tokens": 1000000, "expected_latency_ms": 3000},
+    {"tier": "strong", "model": "gemini-2.5-flash", "max_input_tokens": 1000000, "expected_latency_ms": 8000},
+]
+
+# Minimum tier per rubric preset (mirrors frontend/src/utils/rubrics.js).
+# Presets that ask for structural judgements (STAR, persuasion, argument
+# quality) start one tier up; custom rubrics do too since they often carry
+# many weighted criteria.
+RUBRIC_PRESET_TIERS = {
+    "Evaluate based on clarity, steady pacing (around 130–150 wpm), minimal filler words, and a clear beginning, middle, and end.": "fast",
+    "Focus on STAR method (Situation, Task, Action, Result), confidence, concise answers, professional vocabulary, and flag rambling or hesitation.": "standard",
+    "Focus on energy and persuasion, a strong hook, clear problem/solution structure, and an explicit call to action.": "standard",
+    'Focus on logical flow, authoritative tone, avoiding weak language ("I think", "maybe"), and clear, supported arguments.': "standard",
+    "Focus on narrative arc, vivid vocabulary, emotional engagement, and pacing variation to build suspense.": "fast",
+}
+CUSTOM_RUBRIC_TIER = "standard"
+
+# Coach questions this short, with little history, are simple follow-ups
+SIMPLE_COACH_QUESTION_CHARS = 200
+SIMPLE_COACH_HISTORY_TURNS = 4
+
+# Weight of the newest sample in the per-tier latency average
+LATENCY_EWMA_ALPHA = 0.2
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count (~4 characters per token), good enough for routing."""
+    return sum(len(t) for t in texts if t) // 4
+
+
+def rubric_tier(rubric: str) -> str:
+    return RUBRIC_PRESET_TIERS.get(rubric.strip(), CUSTOM_RUBRIC_TIER)
+
+
+def coach_tier(question: str, history_turns: int) -> str:
+    if len(question) <= SIMPLE_COACH_QUESTION_CHARS and history_turns <= SIMPLE_COACH_HISTORY_TURNS:
+        return "fast"
+    return "standard"
+
+
+def _load_model_table() -> list[dict]:
+    raw = os.getenv("GEMINI_MODEL_TABLE")
+    if not raw:
+        return DEFAULT_MODEL_TABLE
+    try:
+        table = json.loads(raw)
+        if not isinstance(table, list) or not table:
+            raise ValueError("expected a non-empty list")
+        for entry in table:
+            missing = {"tier", "model", "max_input_tokens", "expected_latency_ms"} - entry.keys()
+            if missing:
+                raise KeyError(", ".join(sorted(missing)))
+        return table
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # json.JSONDecodeError is a ValueError
+        logger.warning(f"Invalid GEMINI_MODEL_TABLE ({e}); using defaults")
+        return DEFAULT_MODEL_TABLE
+
+
+class ModelRouter:
+    """
+    Picks a Gemini model per call from the model table.
+
+    The starting tier is the cheapest one allowed by the task (rubric preset
+    or coach question) that can hold the input. A latency budget may move
+    the choice down to a faster tier. If the call fails or its structured
+    output does not validate, the call is retried on the next stronger tier.
+    """
+
+    def __init__(self, table: list[dict]):
+        self.table = table
+        self.tier_index = {entry["tier"]: i for i, entry in enumerate(table)}
+        self.latency_ms = {entry["tier"]: float(entry["expected_latency_ms"]) for entry in table}
+        self.calls = {entry["tier"]: 0 for entry in table}
+        self.failures = {entry["tier"]: 0 for entry in table}
+        self.lock = threading.Lock()
+
+    def choose(self, input_tokens: int, min_tier: str, latency_budget_ms: Optional[float] = None) -> int:
+        start = self.tier_index.get(min_tier, 0)
+        fits = [i for i in range(len(self.table)) if self.table[i]["max_input_tokens"] >= input_tokens]
+        if not fits:
+            return len(self.table) - 1
+
+        candidates = [i for i in fits if i >= start]
+        index = candidates[0] if candidates else fits[-1]
+        if latency_budget_ms is not None and self.latency_ms[self.table[index]["tier"]] > latency_budget_ms:
+            # Trade quality for speed: the strongest fitting tier within budget
+            within = [i for i in fits if i < index and self.latency_ms[self.table[i]["tier"]] <= latency_budget_ms]
+            if within:
+                index = within[-1]
+        return index
+
+    def record(self, tier: str, elapsed_ms: float, ok: bool):
+        with self.lock:
+            self.calls[tier] += 1
+            if not ok:
+                self.failures[tier] += 1
+            self.latency_ms[tier] += LATENCY_EWMA_ALPHA * (elapsed_ms - self.latency_ms[tier])
+
+    def call(
+        self,
+        task: str,
+        input_tokens: int,
+        min_tier: str,
+        fn: Callable[[str], T],
+        validate: Callable[[T], bool] = lambda result: result is not None,
+        latency_budget_ms: Optional[float] = None,
+    ) -> T:
+        """Runs `fn(model)` on the routed model, escalating on failure."""
+        index = self.choose(input_tokens, min_tier, latency_budget_ms)
+        logger.info(
+            f"Routing {task}: tier={self.table[index]['tier']} model={self.table[index]['model']} "
+            f"tokens~{input_tokens} min_tier={min_tier} budget_ms={latency_budget_ms}"
+        )
+
+        last_error: Optional[Exception] = None
+        for entry in self.table[index:]:
+            start = time.perf_counter()
+            try:
+                result = fn(entry["model"])
+                ok = validate(result)
+            except Exception as e:
+                last_error = e
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.record(entry["tier"], elapsed_ms, ok)
+            logger.info(
+                f"{task} on tier={entry['tier']} took {elapsed_ms:.0f}ms ok={ok} "
+                f"(avg {self.latency_ms[entry['tier']]:.0f}ms over {self.calls[entry['tier']]} calls)"
+            )
+            if ok:
+                return result
+            logger.warning(f"{task} failed validation on tier={entry['tier']}; escalating")
+
+        if last_error is not None:
+            raise last_error
+        raise ValueError(f"{task}: no model tier produced a valid response")
+
+
+model_router = ModelRouter(_load_model_table())
@@ -0,0 +1,182 @@
+from fastapi.concurrency import run_in_threadpool
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from assembly import transcribe_audio
+from analyze import calc_wpm, check_fillers, pace_feedback, calc_confidence
+from gemini import gemini_output
+from waveform import compute_peaks
+from search_index import index_transcript
+from schemas import AnalyzeResponse, WordTiming
+
+logger = logging.getLogger(__name__)
+
+# Transcriptions are cached per (user, audio) so re-scoring drafts against a
+# new rubric, or re-submitting the same audio, skips AssemblyAI. Per process,
+# bounded by approximate memory use rather than entry count: an hour-long
+# speech with word timings takes a few MB.
+TRANSCRIPT_CACHE_MB = float(os.getenv("TRANSCRIPT_CACHE_MB", "64"))
+# Measured footprint of one word timing dict (text, start, end, confidence)
+_WORD_BYTES = 350
+
+
+def _cached_size(entry: tuple) -> int:
+    _, transcription = entry
+    return len(transcription.get('text') or "") + _WORD_BYTES * len(transcription.get('words') or ())
+
+
+transcript_cache = TTLCache(
+    maxsize=int(TRANSCRIPT_CACHE_MB * 1024 * 1024),
+    ttl=int(os.getenv("TRANSCRIPT_CACHE_TTL", "86400")),
+    getsizeof=_cached_size,
+)
+
+# How long to wait for waveform peaks once transcription and scoring are done
+PEAKS_WAIT_TIMEOUT = float(os.getenv("PEAKS_WAIT_TIMEOUT", "5"))
+
+# Keeps fire-and-forget indexing tasks referenced until they finish
+_indexing_tasks = set()
+
+
+def _file_digest(audio_path: str) -> str:
+    h = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _transcript_key(uid: str, audio_digest: str) -> str:
+    # Derived from the audio's SHA-256, so callers that already hashed the
+    # upload don't read it again
+    return hashlib.sha256(f"{uid}\0{audio_digest}".encode("utf-8")).hexdigest()
+
+
+def get_cached_transcription(uid: str, key: str) -> Optional[dict]:
+    """Returns the cached transcription for `key` if it belongs to `uid`."""
+    entry = transcript_cache.get(key)
+    if entry is None or entry[0] != uid:
+        return None
+    return entry[1]
+
+
+def rubric_scores_dict(gemini_response) -> dict:
+    # rubric_scores is list of items: {'criterion': '...', 'score': X, 'max_score': Y}
+    # We need Dict[str, RubricScore] -> {'Criterion': {'score': X, 'max_score': Y}}
+    return {
+        r.criterion: {'score': r.score, 'max_score': r.max_score}
+        for r in gemini_response.rubric_scores
+    }
+
+
+def _schedule_indexing(uid: str, key: str, transcription: dict, prompt: str):
+    """Adds a new transcript to the user's search index without delaying the response."""
+    if not transcription.get('words'):
+        return
+
+    async def index():
+        try:
+            await run_in_threadpool(index_transcript, uid, key, transcription['words'], prompt)
+        except Exception as e:
+            logger.error(f"Search indexing failed: {e}", exc_info=True)
+
+    task = asyncio.ensure_future(index())
+    _indexing_tasks.add(task)
+    task.add_done_callback(_indexing_tasks.discard)
+
+
+async def run_analysis(uid: str, audio_path: str, prompt: str, rubric: str, api_key: str,
+                       latency_budget_ms: Optional[float] = None,
+                       audio_digest: Optional[str] = None) -> AnalyzeResponse:
+    """
+    Runs the full analysis pipeline (AssemblyAI transcription, Gemini rubric
+    feedback, local metrics) on an audio file that is already on disk.
+
+    The blocking SDK calls run in the threadpool so the event loop stays free.
+    Waveform peaks are decoded locally while AssemblyAI works.
+    `latency_budget_ms` is passed to the Gemini model router. The
+    transcription is cached under the returned `transcript_key`, derived
+    from `audio_digest` (the file's SHA-256 hex) when the caller has it.
+    """
+    peaks_task = asyncio.ensure_future(run_in_threadpool(compute_peaks, audio_path))
+
+    try:
+        if audio_digest is None:
+            audio_digest = await run_in_threadpool(_file_digest, audio_path)
+        key = _transcript_key(uid, audio_digest)
+        transcription = get_cached_transcription(uid, key)
+        if transcription is None:
+            # SDK handles upload and polling
+            logger.info(f"Starting transcription for {audio_path}")
+            transcription = await run_in_threadpool(transcribe_audio, audio_path, api_key)
+            try:
+                transcript_cache[key] = (uid, transcription)
+            except ValueError:
+                pass  # Larger than the whole cache; just don't cache it
+            _schedule_indexing(uid, key, transcription, prompt)
+        else:
+            logger.info(f"Using cached transcription for {audio_path}")
+        transcript_text = transcription['text']
+
+        logger.info("Transcription complete. Getting Gemini feedback.")
+        gemini_response = await run_in_threadpool(gemini_output, transcript_text, prompt, rubric, latency_budget_ms)
+    except BaseException:
+        peaks_task.cancel()
+        raise
+
+    audio_duration = transcription['audio_duration']
+    wpm = calc_wpm(transcription)
+    filler_count = check_fillers(transcription)
+    pace_feedback_result = pace_feedback(wpm)
+    confidence = calc_confidence(transcription) * 10
+    strengths = gemini_response.strengths
+    improvements = gemini_response.improvements
+    rubric_total = gemini_response.rubric_total
+    rubric_max = gemini_response.rubric_max
+
+    # Extract word timestamps from AssemblyAI response
+    words = None
+    if 'words' in transcription and transcription['words']:
+        words = [
+            WordTiming(
+                text=word.get('text', ''),
+                start=word.get('start', 0),  # AssemblyAI returns in milliseconds
+                end=word.get('end', 0),
+                confidence=word.get('confidence', 0.0)
+            )
+            for word in transcription['words']
+        ]
+
+    # Decoding usually finishes long before transcription; don't hold the
+    # response (and its admission slot) hostage to an optional extra
+    try:
+        peaks = await asyncio.wait_for(peaks_task, timeout=PEAKS_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Waveform peaks not ready after {PEAKS_WAIT_TIMEOUT:.0f}s; omitting them")
+        peaks = None
+    except Exception as e:
+        logger.warning(f"Waveform peak extraction failed: {e}")
+        peaks = None
+
+    return AnalyzeResponse(
+        transcript=transcript_text,
+        audio_duration=audio_duration,
+        wpm=wpm,
+        filler_count=filler_count,
+        clarity_score=confidence,
+        pace_feedback=pace_feedback_result,
+        ai_feedback={
+            "strengths": strengths,
+            "improvements": improvements,
+        },
+        rubric_scores=rubric_scores_dict(gemini_response),
+        rubric_total=rubric_total,
+        rubric_max=rubric_max,
+        words=words,
+        peaks=peaks,
+        transcript_key=key,
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying `X-Profile: <PROFILE_TOKEN>` are always profiled
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of other requests to profile (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Profiles are written here; the oldest are deleted past PROFILE_MAX_FILES
+profile_dir = Path(os.getenv("PROFILE_DIR", "temp/profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# One profile at a time per worker keeps the overhead bounded
+_active = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _is_idle_worker(stack: list) -> bool:
+    # Threadpool workers parked on their job queue are not doing our work
+    return len(stack) >= 2 and "(threading.py:" in stack[-1] and "(queue.py:" in stack[-2]
+
+
+class StackSampler:
+    """
+    Samples every thread's Python stack at a fixed interval from a
+    background thread and aggregates them in collapsed ("folded") format,
+    which flamegraph.pl, speedscope and inferno read directly.
+
+    Samples cover the whole worker process: the event loop thread (where
+    Pydantic models are built and JSON is encoded) and the threadpool
+    (where SDK calls block on AssemblyAI/Gemini). Requests running
+    concurrently on the same worker show up in the same profile.
+    """
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                if _is_idle_worker(stack):
+                    continue
+                self.counts[";".join([names.get(ident, str(ident))] + stack)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def _has_profile_token(headers: Headers) -> bool:
+    token = headers.get("x-profile")
+    # Headers are decoded as latin-1; compare bytes, since compare_digest
+    # rejects non-ASCII str
+    return bool(token and PROFILE_TOKEN) and hmac.compare_digest(
+        token.encode("latin-1"), PROFILE_TOKEN.encode("utf-8")
+    )
+
+
+def _sampled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _write_profile(name: str, content: str):
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    (profile_dir / name).write_text(content)
+
+    profiles = sorted(profile_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:-PROFILE_MAX_FILES]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            pass  # Another worker rotated it first
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in sampling profiler. Profiles a request when it carries the
+    privileged `X-Profile` header or is picked by PROFILE_SAMPLE_RATE;
+    every other request passes straight through to the app.
+
+    Sampling stops once the last body chunk is sent, so streaming responses
+    are profiled to the end. Only privileged requests learn the profile's
+    file name, via the `X-Profile-Id` response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        privileged = _has_profile_token(Headers(scope=scope))
+        if not (privileged or _sampled()) or not _active.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        method, path = scope["method"], scope["path"]
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", path).strip("-") or "root"
+        name = None
+        sampler = StackSampler(PROFILE_INTERVAL_MS)
+        start = time.perf_counter()
+        stopped = False
+
+        def stop():
+            nonlocal stopped
+            if not stopped:
+                stopped = True
+                sampler.stop()
+                _active.release()
+
+        async def send_profiled(message: Message):
+            nonlocal name
+            if message["type"] == "http.response.start":
+                # Named up front so the header can carry it
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{method}-{slug}-{message['status']}-{uuid.uuid4().hex[:8]}.folded"
+                if privileged:
+                    MutableHeaders(scope=message).append("X-Profile-Id", name)
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                stop()
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            stop()
+
+        if name is None:
+            return  # No response was started; nothing to attribute the samples to
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        try:
+            await asyncio.to_thread(_write_profile, name, sampler.folded())
+            logger.info(f"Profiled {method} {path} in {elapsed_ms:.0f}ms: {sampler.samples} samples -> {name}")
+        except Exception as e:
+            logger.error(f"Failed to write profile: {e}", exc_info=True)
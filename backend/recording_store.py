@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Optional
+
+import firebase  # noqa: F401  Initializes the Firebase Admin app
+from firebase_admin import firestore_async
+from google.cloud.firestore import SERVER_TIMESTAMP
+
+from schemas import AnalyzeResponse
+from word_encoding import decode_words, encode_words
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects batches with more writes than this
+MAX_BATCH_WRITES = 500
+
+WORDS_ENCODING = "chunked-v1"
+CHUNKS_COLLECTION = "word_chunks"
+
+_db = None
+
+
+def _client():
+    # Honors FIRESTORE_EMULATOR_HOST, so tests can run against the local emulator
+    global _db
+    if _db is None:
+        _db = firestore_async.client()
+    return _db
+
+
+def _encode_peaks(peaks: dict) -> dict:
+    # int8 bytes instead of Firestore integer arrays, ~8x smaller
+    return {
+        **peaks,
+        "levels": [
+            {**level, "min": bytes(v & 0xFF for v in level['min']), "max": bytes(v & 0xFF for v in level['max'])}
+            for level in peaks['levels']
+        ],
+    }
+
+
+def _decode_peaks(peaks: dict) -> dict:
+    def signed(data: bytes) -> list[int]:
+        return [v - 256 if v > 127 else v for v in data]
+
+    return {
+        **peaks,
+        "levels": [{**level, "min": signed(level['min']), "max": signed(level['max'])} for level in peaks['levels']],
+    }
+
+
+def valid_document_id(doc_id: str) -> bool:
+    # Firestore document ids: no slashes, not "." or "..", at most 1500 bytes
+    return bool(doc_id) and "/" not in doc_id and doc_id not in (".", "..") and len(doc_id.encode("utf-8")) <= 1500
+
+
+def _recordings(uid: str, project_id: Optional[str]):
+    db = _client()
+    if project_id:
+        return db.collection("users").document(uid).collection("projects").document(project_id).collection("recordings")
+    # Same fallback as the web client for analyses outside a project
+    return db.collection("feedback")
+
+
+async def save_recording(uid: str, project_id: Optional[str], result: AnalyzeResponse) -> str:
+    """
+    Stores an analysis result where the web client would, with word timings
+    in a `word_chunks` subcollection. Returns the new recording id.
+
+    Chunks are committed first, in parallel batches; the recording document
+    goes in the last batch, so a listed recording always has its words.
+    """
+    ref = _recordings(uid, project_id).document()
+
+    doc = result.model_dump(exclude={"words", "peaks"})
+    if result.peaks:
+        doc["peaks"] = _encode_peaks(result.peaks.model_dump())
+    words = [w.model_dump() for w in result.words or []]
+    chunks = encode_words(words)
+    doc.update(words_encoding=WORDS_ENCODING, word_count=len(words), word_chunk_count=len(chunks))
+    if project_id:
+        doc["createdAt"] = SERVER_TIMESTAMP
+    else:
+        doc.update(uid=uid, timestamp=SERVER_TIMESTAMP)
+
+    db = _client()
+    writes = [(ref.collection(CHUNKS_COLLECTION).document(f"{c['index']:05d}"), c) for c in chunks]
+    batches = []
+    for offset in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for chunk_ref, chunk in writes[offset:offset + MAX_BATCH_WRITES]:
+            batch.set(chunk_ref, chunk)
+        batches.append(batch)
+
+    if batches and len(writes) % MAX_BATCH_WRITES:
+        last = batches.pop()  # Room left: the recording rides along atomically
+    else:
+        last = db.batch()
+    last.set(ref, doc)
+
+    await asyncio.gather(*(batch.commit() for batch in batches))
+    await last.commit()
+    logger.info(f"Saved recording {ref.id} with {len(words)} words in {len(chunks)} chunk(s)")
+    return ref.id
+
+
+async def load_recording(uid: str, project_id: Optional[str], recording_id: str) -> Optional[AnalyzeResponse]:
+    """Reads a recording saved by save_recording, decoding words and peaks."""
+    ref = _recordings(uid, project_id).document(recording_id)
+    snapshot = await ref.get()
+    if not snapshot.exists:
+        return None
+    doc = snapshot.to_dict()
+    if not project_id and doc.get("uid") != uid:
+        return None
+
+    # Recordings saved by the web client keep plain `words`/`peaks` fields
+    if doc.get("words_encoding") == WORDS_ENCODING:
+        chunks = [c.to_dict() async for c in ref.collection(CHUNKS_COLLECTION).stream()]
+        doc["words"] = decode_words(chunks)
+        if doc.get("peaks"):
+            doc["peaks"] = _decode_peaks(doc["peaks"])
+    return AnalyzeResponse.model_validate(doc)
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from pathlib import Path
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
+from typing import Optional, Union
 from dotenv import load_dotenv
 
-from assembly import transcribe_audio
-from analyze import calc_wpm, check_fillers, pace_feedback, calc_confidence
-from gemini import gemini_output
 from firebase import get_current_user
-from schemas import AnalyzeResponse, WordTiming
+from admission import analysis_admission
+from audio_store import audio_store
+from pipeline import run_analysis
+from recording_store import save_recording, valid_document_id
+from singleflight import SingleFlight, request_key
+from schemas import AnalyzeResponse, AnalysisSummary
 
 load_dotenv()
 
@@ -17,40 +21,50 @@ assembly_api_key = os.getenv("ASSEMBLYAI_API_KEY")
 if not assembly_api_key:
     print("Warning: ASSEMBLYAI_API_KEY not set")
 
-# Ensure temp directory exists
-temp_dir = Path("temp")
-temp_dir.mkdir(exist_ok=True)
-
 # Maximum file size: 20MB
 MAX_FILE_SIZE = 20 * 1024 * 1024
 
+# Identical uploads (double-clicks, retries, extra tabs) share one analysis
+analysis_flights = SingleFlight()
+
 
-@router.post("/analyze", response_model=AnalyzeResponse)
+@router.post("/analyze", response_model=Union[AnalyzeResponse, AnalysisSummary])
 async def analyzeAudio(
+    request: Request,
     audio_file: UploadFile = File(...),
     prompt: str = Form(...),
     rubric: str = Form(...),
+    latency_budget_ms: Optional[float] = Form(None),
+    persist: bool = Form(False),
+    project_id: Optional[str] = Form(None),
     user = Depends(get_current_user)
 ):
     """
     Analyze audio file and return comprehensive speech analysis results.
-    
+
     - **audio_file**: Audio file to analyze (MP3, WAV, etc.)
     - **prompt**: Task/prompt for the analysis
     - **rubric**: Rubric criteria for evaluation
+    - **latency_budget_ms**: Optional target for the scoring step; may select a faster model
+    - **persist**: Save the result to Firestore server-side and return only an `AnalysisSummary`
+    - **project_id**: Project to save into when persisting (omit for quick analyses)
     - **user**: Authenticated user (from Firebase token)
-    
+
     Returns analysis including transcript, WPM, filler words, clarity score,
-    pace feedback, AI feedback, and rubric scores.
+    pace feedback, AI feedback, and rubric scores. With `persist`, the result
+    is stored under the user's project and only the recording id and summary
+    metrics are returned; fetch the rest from `/api/recordings/{recording_id}`.
+    If saving fails, the full result is returned so the client can save it.
+
+    Identical requests from the same user (same audio, prompt and rubric)
+    that arrive while one is still running share its result.
     """
-    import time
     import logging
 
     logger = logging.getLogger(__name__)
 
     logger.info(f"Analysis request received. File: {audio_file.filename if audio_file else 'None'}, User: {user.get('uid') if user else 'None'}")
-    
-    audio_file_path = None
+
     try:
         # Validate file size
         contents = await audio_file.read()
@@ -67,71 +81,44 @@ async def analyzeAudio(
                 detail="Invalid file type. Only audio files are allowed."
             )
 
-        # Save file
-        audio_file_path = temp_dir / audio_file.filename
-        with open(audio_file_path, 'wb') as f:
-            f.write(contents)
+        if project_id is not None and not valid_document_id(project_id):
+            raise HTTPException(status_code=400, detail="Invalid project_id")
 
         # Process audio
         if not assembly_api_key:
             logger.error("ASSEMBLYAI_API_KEY not configured")
             raise HTTPException(status_code=500, detail="Server configuration error")
-        
-        # SDK handles upload and polling
-        logger.info(f"Starting transcription for {audio_file.filename}")
-        transcription = transcribe_audio(str(audio_file_path), assembly_api_key)
-        transcript_text = transcription['text']
-
-        logger.info("Transcription complete. Getting Gemini feedback.")
-        gemini_response = gemini_output(transcript_text, prompt, rubric)
-
-
-        audio_duration = transcription['audio_duration']
-        wpm = calc_wpm(transcription)
-        filler_count = check_fillers(transcription)
-        pace_feedback_result = pace_feedback(wpm)
-        confidence = calc_confidence(transcription) * 10
-        strengths = gemini_response.strengths
-        improvements = gemini_response.improvements
-        rubric_scores = [r.dict() for r in gemini_response.rubric_scores]
-        # rubric_scores is list of dicts: {'criterion': '...', 'score': X, 'max_score': Y}
-        # We need Dict[str, RubricScore] -> {'Criterion': {'score': X, 'max_score': Y}}
-        rubric_scores_dict = {
-            r['criterion']: {'score': r['score'], 'max_score': r['max_score']}
-            for r in rubric_scores
-        }
-        rubric_total = gemini_response.rubric_total
-        rubric_max = gemini_response.rubric_max
-
-        # Extract word timestamps from AssemblyAI response
-        words = None
-        if 'words' in transcription and transcription['words']:
-            words = [
-                WordTiming(
-                    text=word.get('text', ''),
-                    start=word.get('start', 0),  # AssemblyAI returns in milliseconds
-                    end=word.get('end', 0),
-                    confidence=word.get('confidence', 0.0)
-                )
-                for word in transcription['words']
-            ]
-
-        result = AnalyzeResponse(
-            transcript=transcript_text,
-            audio_duration=audio_duration,
-            wpm=wpm,
-            filler_count=filler_count,
-            clarity_score=confidence,
-            pace_feedback=pace_feedback_result,
-            ai_feedback={
-                "strengths": strengths,
-                "improvements": improvements,
-            },
-            rubric_scores=rubric_scores_dict,
-            rubric_total=rubric_total,
-            rubric_max=rubric_max,
-            words=words,
-        )
+
+        async def analyze_upload():
+            # Wait for a fair share of the worker (or get a 429)
+            async with analysis_admission.slot(user['uid']):
+                # Content-addressed and reference counted, so concurrent uploads
+                # that share a filename (or the same bytes) never clobber each other
+                async with audio_store.stored(contents, audio_file.filename, digest) as audio_file_path:
+                    result = await run_analysis(
+                        user['uid'], str(audio_file_path), prompt, rubric, assembly_api_key, latency_budget_ms,
+                        audio_digest=digest,
+                    )
+            if not persist:
+                return result
+
+            try:
+                recording_id = await save_recording(user['uid'], project_id, result)
+            except Exception as e:
+                # Don't lose the analysis: the client saves the full result itself
+                logger.error(f"Failed to persist analysis: {str(e)}", exc_info=True)
+                return result
+            return AnalysisSummary(
+                recording_id=recording_id,
+                project_id=project_id,
+                **result.model_dump(include=set(AnalysisSummary.model_fields) - {"recording_id", "project_id"}),
+            )
+
+        # Hashed once, off the event loop; the audio store and transcript
+        # cache reuse the digest
+        digest = await run_in_threadpool(lambda: hashlib.sha256(contents).hexdigest())
+        key = request_key(user['uid'], digest, prompt, rubric, latency_budget_ms, persist, project_id)
+        result = await analysis_flights.do(key, analyze_upload, request)
 
         logger.info("Analysis complete successfully.")
         return result
@@ -144,10 +131,3 @@ async def analyzeAudio(
             status_code=500,
             detail="An error occurred while analyzing the speech."
         )
-    finally:
-        # Clean up temp file
-        if audio_file_path and audio_file_path.exists():
-            try:
-                audio_file_path.unlink()
-            except Exception:
-                pass  # Ignore cleanup errors
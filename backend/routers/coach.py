@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from schemas import CoachRequest, CoachResponse
 from gemini import chat_with_coach
+from firebase import get_optional_user
+from singleflight import SingleFlight, request_key
 
 router = APIRouter(
     prefix="/api/coach",
@@ -8,14 +11,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Identical chat turns (retries, double sends) share one Gemini call
+coach_flights = SingleFlight()
+
 @router.post("/chat", response_model=CoachResponse)
-async def chat(request: CoachRequest):
+async def chat(request: CoachRequest, http_request: Request, user = Depends(get_optional_user)):
     """
     Chat with the AI Speech Coach.
     """
     try:
-        response_text = chat_with_coach(request)
+        key = request_key(user['uid'] if user else "", request.model_dump_json())
+
+        async def answer():
+            return await run_in_threadpool(chat_with_coach, request)
+
+        response_text = await coach_flights.do(key, answer, http_request)
         return CoachResponse(response=response_text)
+    except HTTPException:
+        raise
     except Exception as e:
         # In case something goes wrong in the router logic itself
         raise HTTPException(status_code=500, detail=str(e))
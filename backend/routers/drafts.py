@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+
+from analyze import calc_wpm, check_fillers, calc_confidence
+from draft_diff import diff_words
+from firebase import get_current_user
+from schemas import DraftDiffRequest, DraftDiffResponse, DraftWords
+
+router = APIRouter(prefix="/api/drafts", tags=["drafts"])
+
+
+def _metrics(draft: DraftWords) -> tuple[dict, list]:
+    """Summary metrics for a draft, plus its words as plain dicts for the diff."""
+    transcription = {
+        "words": [w.model_dump() for w in draft.words],
+        "audio_duration": draft.audio_duration,
+    }
+    if not draft.words or draft.audio_duration <= 0:
+        return {"wpm": 0, "filler_count": {}, "clarity_score": 0.0}, transcription["words"]
+    return {
+        "wpm": int(calc_wpm(transcription)),
+        "filler_count": check_fillers(transcription),
+        "clarity_score": calc_confidence(transcription) * 10,
+    }, transcription["words"]
+
+
+def _compare(body: DraftDiffRequest) -> DraftDiffResponse:
+    base_metrics, base_words = _metrics(body.base)
+    target_metrics, target_words = _metrics(body.target)
+
+    fillers = base_metrics["filler_count"].keys() | target_metrics["filler_count"].keys()
+    filler_delta = {
+        f: target_metrics["filler_count"].get(f, 0) - base_metrics["filler_count"].get(f, 0)
+        for f in sorted(fillers)
+    }
+
+    return DraftDiffResponse(
+        spans=diff_words(base_words, target_words),
+        base_metrics=base_metrics,
+        target_metrics=target_metrics,
+        wpm_delta=target_metrics["wpm"] - base_metrics["wpm"],
+        filler_delta=filler_delta,
+        clarity_delta=round(target_metrics["clarity_score"] - base_metrics["clarity_score"], 2),
+    )
+
+
+@router.post("/diff", response_model=DraftDiffResponse)
+async def diff_drafts(body: DraftDiffRequest, user = Depends(get_current_user)):
+    """
+    Compare two drafts of a speech.
+
+    Aligns the drafts' word sequences and returns kept, inserted and deleted
+    spans with timestamps, plus the change in WPM, per-filler counts and
+    clarity from `base` to `target`.
+    """
+    return await run_in_threadpool(_compare, body)
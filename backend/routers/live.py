@@ -0,0 +1,113 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+import asyncio
+import logging
+import os
+
+from analyze import LiveMetrics
+from firebase import get_current_user
+from streaming import create_streaming_transcriber, LIVE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/live", tags=["live"])
+
+# Seconds between metric pushes to the client
+LIVE_UPDATE_INTERVAL = float(os.getenv("LIVE_UPDATE_INTERVAL", "1.0"))
+# Sliding window the live metrics are computed over
+LIVE_WINDOW_MS = float(os.getenv("LIVE_WINDOW_MS", "30000"))
+# Seconds a client has to send its token after the socket opens
+LIVE_AUTH_TIMEOUT = float(os.getenv("LIVE_AUTH_TIMEOUT", "10"))
+
+
+async def _authenticate(websocket: WebSocket):
+    """Reads the Firebase ID token from the first text message; None if it is missing or invalid."""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), LIVE_AUTH_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    token = message.get("text")
+    if not token:
+        return None
+    try:
+        return await get_current_user(f"Bearer {token}")
+    except HTTPException:
+        return None
+
+
+@router.websocket("/ws")
+async def live_coaching(websocket: WebSocket):
+    """
+    Live pace and filler feedback while the user speaks.
+
+    Browsers cannot set headers on WebSockets, and a token in the URL would
+    end up in access logs, so the client sends its Firebase ID token as the
+    first text message, within LIVE_AUTH_TIMEOUT seconds. Nothing is
+    transcribed before it is verified. The client then streams binary frames of
+    16kHz 16-bit mono PCM and sends the text message "stop" when done.
+    Every LIVE_UPDATE_INTERVAL seconds the server pushes
+    `{"type": "metrics", ...}` computed over the last LIVE_WINDOW_MS of
+    speech; after "stop" it sends one `{"type": "final", ...}` message.
+    """
+    await websocket.accept()
+    try:
+        user = await _authenticate(websocket)
+    except WebSocketDisconnect:
+        return
+    if user is None:
+        await websocket.close(code=1008)
+        return
+    logger.info(f"Live session started. User: {user.get('uid')}")
+
+    transcriber = create_streaming_transcriber()
+    metrics = LiveMetrics(window_ms=LIVE_WINDOW_MS)
+
+    async def push_updates():
+        while True:
+            await asyncio.sleep(LIVE_UPDATE_INTERVAL)
+            metrics.add_words(transcriber.take_words())
+            await websocket.send_json({"type": "metrics", **metrics.snapshot()})
+
+    pusher = None
+    connected = False
+    stopped = False
+    try:
+        await transcriber.connect()
+        connected = True
+        await websocket.send_json({"type": "ready", "sample_rate": LIVE_SAMPLE_RATE})
+        pusher = asyncio.create_task(push_updates())
+
+        while True:
+            receive = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receive, pusher}, return_when=asyncio.FIRST_COMPLETED)
+            if pusher.done():
+                # Pushing failed; end the session rather than read audio nobody sees
+                receive.cancel()
+                pusher.result()
+            message = receive.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await transcriber.send_audio(message["bytes"])
+            elif message.get("text") == "stop":
+                stopped = True
+                pusher.cancel()
+                # Closing flushes the backend, so the final words are included
+                await transcriber.close()
+                metrics.add_words(transcriber.take_words())
+                await websocket.send_json({"type": "final", **metrics.snapshot()})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Live session error: {str(e)}", exc_info=True)
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass  # Client already gone
+    finally:
+        if pusher is not None:
+            pusher.cancel()
+        if connected and not stopped:
+            await transcriber.close()
+        logger.info(f"Live session ended. User: {user.get('uid')}")
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from typing import Optional
+
+from firebase import get_current_user
+from recording_store import load_recording, valid_document_id
+from schemas import AnalyzeResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/recordings", tags=["recordings"])
+
+
+@router.get("/{recording_id}", response_model=AnalyzeResponse)
+async def get_recording(
+    recording_id: str,
+    project_id: Optional[str] = Query(None),
+    user = Depends(get_current_user)
+):
+    """
+    Full analysis result of a recording saved with `persist` on
+    `/api/analyze`, with word timings and waveform peaks decoded.
+    """
+    if project_id is not None and not valid_document_id(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project_id")
+    try:
+        result = await load_recording(user['uid'], project_id, recording_id)
+    except Exception as e:
+        logger.error(f"Failed to load recording {recording_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not load the recording.")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return result
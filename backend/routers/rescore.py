@@ -0,0 +1,118 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import asyncio
+import logging
+import os
+
+from admission import analysis_admission
+from firebase import get_current_user
+from gemini import gemini_output
+from pipeline import get_cached_transcription, rubric_scores_dict
+from schemas import RescoreItem, RescoreRequest, RescoreResult
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["analysis"])
+
+# Gemini calls in flight at once for a single batch
+RESCORE_CONCURRENCY = int(os.getenv("RESCORE_CONCURRENCY", "4"))
+# Largest batch accepted in one request
+MAX_RESCORE_RECORDINGS = int(os.getenv("MAX_RESCORE_RECORDINGS", "100"))
+
+
+@router.post("/rescore")
+async def rescore(body: RescoreRequest, user = Depends(get_current_user)):
+    """
+    Re-score stored drafts against a new rubric without re-transcribing.
+
+    Each recording supplies its stored `transcript`. The `transcript_key`
+    returned by `/api/analyze` is only a shortcut: it resolves from this
+    worker's transcript cache, and a miss is reported per recording. Results stream back as newline-delimited JSON
+    (`RescoreResult` per line) in completion order, so a client can update
+    each draft as soon as its scores arrive. N drafts cost N Gemini calls.
+    """
+    if not body.recordings:
+        raise HTTPException(status_code=400, detail="No recordings to re-score")
+    if len(body.recordings) > MAX_RESCORE_RECORDINGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many recordings. Maximum is {MAX_RESCORE_RECORDINGS} per request."
+        )
+
+    uid = user['uid']
+    logger.info(f"Rescore request received. Recordings: {len(body.recordings)}, User: {uid}")
+    semaphore = asyncio.Semaphore(RESCORE_CONCURRENCY)
+
+    async def score(item: RescoreItem) -> RescoreResult:
+        transcript = item.transcript
+        if transcript is None and item.transcript_key:
+            cached = get_cached_transcription(uid, item.transcript_key)
+            transcript = cached['text'] if cached else None
+        if not transcript:
+            return RescoreResult(
+                recording_id=item.recording_id,
+                error="Transcript not available; send the transcript text instead of a key."
+            )
+
+        async with semaphore:
+            try:
+                response = await run_in_threadpool(
+                    gemini_output, transcript, body.prompt, body.rubric, body.latency_budget_ms
+                )
+            except Exception as e:
+                logger.error(f"Rescore failed for {item.recording_id}: {str(e)}", exc_info=True)
+                return RescoreResult(recording_id=item.recording_id, error="Scoring failed")
+
+        return RescoreResult(
+            recording_id=item.recording_id,
+            rubric_scores=rubric_scores_dict(response),
+            rubric_total=response.rubric_total,
+            rubric_max=response.rubric_max,
+            ai_feedback={"strengths": response.strengths, "improvements": response.improvements},
+        )
+
+    released = False
+
+    def release_once():
+        nonlocal released
+        if not released:
+            released = True
+            analysis_admission.release(uid)
+
+    async def stream():
+        tasks = []
+        try:
+            tasks = [asyncio.ensure_future(score(item)) for item in body.recordings]
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield result.model_dump_json() + "\n"
+        finally:
+            # Client went away mid-stream: stop scoring the rest
+            for task in tasks:
+                task.cancel()
+            release_once()
+
+    # The whole batch counts as one expensive request. Admit it before the
+    # response starts so a 429 can still carry its Retry-After header.
+    await analysis_admission.acquire(uid)
+
+    return _ReleasingStreamingResponse(stream(), release_once, media_type="application/x-ndjson")
+
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """
+    Calls `on_close` once the response is over, however it ends. The body
+    generator's own cleanup never runs if the client disconnects before
+    Starlette starts iterating it.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+import logging
+
+from firebase import get_current_user
+from search_index import search
+from schemas import SearchResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_history(
+    q: str = Query(..., min_length=1, max_length=500),
+    k: int = Query(10, ge=1, le=50),
+    user = Depends(get_current_user)
+):
+    """
+    Search the user's past speeches (e.g. "When did I talk about leadership?").
+
+    Returns the `k` most similar transcript segments with their timestamps
+    and word ranges, best match first.
+    """
+    try:
+        results = await run_in_threadpool(search, user['uid'], q, k)
+    except Exception as e:
+        logger.error(f"Search failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Search is unavailable right now.")
+    return SearchResponse(results=results)
@@ -0,0 +1,236 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
+import asyncio
+import logging
+
+from firebase import get_current_user
+from admission import analysis_admission
+from pipeline import run_analysis
+from routers.analyze import assembly_api_key, MAX_FILE_SIZE
+from schemas import (
+    AnalyzeResponse,
+    UploadFinalizeRequest,
+    UploadSessionCreate,
+    UploadSessionStatus,
+)
+import upload_sessions
+from upload_sessions import UploadError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/uploads", tags=["uploads"])
+
+# Keep a single chunk well below the request body limits of common proxies
+MAX_CHUNK_SIZE = 5 * 1024 * 1024
+
+# Seconds between checks for a result while another worker analyzes an upload
+RESULT_POLL_INTERVAL = 1.0
+
+# Analyses running in this process. Results outlive the task on disk, and
+# the session's analysis lock keeps other workers from starting a duplicate.
+analysis_tasks: dict[tuple[str, str], asyncio.Task] = {}  # (uid, upload_id) -> task
+
+
+def _error_response(e: UploadError) -> JSONResponse:
+    content = {"detail": e.detail}
+    headers = {}
+    if e.received is not None:
+        content["received"] = e.received
+        headers["Upload-Offset"] = str(e.received)
+    return JSONResponse(status_code=e.status_code, content=content, headers=headers)
+
+
+def _status(meta: dict, received: int) -> UploadSessionStatus:
+    return UploadSessionStatus(
+        upload_id=meta["upload_id"],
+        received=received,
+        total_size=meta["total_size"],
+        complete=received == meta["total_size"],
+    )
+
+
+async def _analyze_session(meta: dict) -> AnalyzeResponse:
+    upload_id = meta["upload_id"]
+    while True:
+        stored = upload_sessions.load_result(upload_id)
+        if stored is not None:
+            return AnalyzeResponse.model_validate_json(stored)
+
+        with upload_sessions.analysis_lock(upload_id) as acquired:
+            if acquired:
+                # Another worker may have finished between the two checks
+                stored = upload_sessions.load_result(upload_id)
+                if stored is not None:
+                    return AnalyzeResponse.model_validate_json(stored)
+                async with analysis_admission.slot(meta["uid"]):
+                    result = await run_analysis(
+                        meta["uid"], str(upload_sessions.data_path(upload_id)), meta["prompt"], meta["rubric"],
+                        assembly_api_key,
+                        # Verified against the data when the last chunk arrived
+                        audio_digest=meta["sha256"],
+                    )
+                # Kept until the session expires so a retried finalize gets the
+                # same result; a failed run keeps the audio and can be retried
+                await asyncio.to_thread(upload_sessions.save_result, upload_id, result.model_dump_json())
+                return result
+
+        # Another worker is analyzing this upload; wait for it to finish or give up
+        await asyncio.sleep(RESULT_POLL_INTERVAL)
+
+
+def _start_analysis(meta: dict) -> asyncio.Task:
+    key = (meta["uid"], meta["upload_id"])
+    task = analysis_tasks.get(key)
+    if task is not None:
+        return task
+
+    # From here on the prompt and rubric are fixed; finalize rejects changes
+    if not meta.get("analysis_started"):
+        meta["analysis_started"] = True
+        upload_sessions.update_session(meta)
+    task = asyncio.create_task(_analyze_session(meta))
+    analysis_tasks[key] = task
+
+    def on_done(t: asyncio.Task):
+        # Success is on disk; after a failure the next finalize starts a fresh
+        # attempt, and may change the prompt and rubric
+        if analysis_tasks.get(key) is t:
+            del analysis_tasks[key]
+        if t.cancelled() or t.exception() is not None:
+            meta["analysis_started"] = False
+            try:
+                upload_sessions.update_session(meta)
+            except OSError:
+                pass  # Session already gone
+
+    task.add_done_callback(on_done)
+    logger.info(f"Started analysis for upload {meta['upload_id']}")
+    return task
+
+
+@router.post("", response_model=UploadSessionStatus)
+async def create_upload(body: UploadSessionCreate, user = Depends(get_current_user)):
+    """
+    Start a resumable upload session.
+
+    Send the file with `PUT /api/uploads/{upload_id}?offset=N` chunks, check
+    progress with `GET /api/uploads/{upload_id}`, then call `finalize`.
+    """
+    if body.total_size <= 0 or body.total_size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {MAX_FILE_SIZE / (1024*1024):.0f}MB"
+        )
+    if not body.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="Invalid file type. Only audio files are allowed.")
+
+    try:
+        meta = await asyncio.to_thread(
+            upload_sessions.create_session,
+            user['uid'], body.filename, body.content_type, body.total_size,
+            sha256=body.sha256, prompt=body.prompt, rubric=body.rubric,
+        )
+    except UploadError as e:
+        return _error_response(e)
+    return _status(meta, 0)
+
+
+@router.get("/{upload_id}", response_model=UploadSessionStatus)
+async def get_upload(upload_id: str, user = Depends(get_current_user)):
+    """Report how many bytes have been received, so a client can resume."""
+    try:
+        meta = upload_sessions.load_session(upload_id, user['uid'])
+        return _status(meta, upload_sessions.received_bytes(upload_id))
+    except UploadError as e:
+        return _error_response(e)
+
+
+@router.put("/{upload_id}", response_model=UploadSessionStatus)
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None),
+    user = Depends(get_current_user)
+):
+    """
+    Store one chunk starting at byte `offset`. An optional `X-Chunk-SHA256`
+    header is verified before anything is written. When the last byte
+    arrives and the session already has a prompt and rubric, analysis starts
+    immediately in the background.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and int(content_length) > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+
+    try:
+        meta = upload_sessions.load_session(upload_id, user['uid'])
+        chunk = await request.body()
+        if len(chunk) > MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+
+        received = await asyncio.to_thread(
+            upload_sessions.write_chunk, meta, offset, chunk, x_chunk_sha256
+        )
+        status = _status(meta, received)
+        if status.complete and meta["prompt"] is not None and meta["rubric"] is not None:
+            _start_analysis(meta)
+        return status
+    except UploadError as e:
+        return _error_response(e)
+
+
+@router.post("/{upload_id}/finalize", response_model=AnalyzeResponse)
+async def finalize_upload(
+    upload_id: str,
+    body: UploadFinalizeRequest,
+    user = Depends(get_current_user)
+):
+    """
+    Return the analysis for a completed upload, starting it if needed.
+    Safe to call again after a dropped connection: the result is kept until
+    the session expires (UPLOAD_SESSION_TTL), on whichever worker answers.
+    Once analysis has started, a different prompt or rubric is rejected
+    with 409.
+    """
+    try:
+        meta = upload_sessions.load_session(upload_id, user['uid'])
+        received = upload_sessions.received_bytes(upload_id)
+    except UploadError as e:
+        return _error_response(e)
+    if received != meta["total_size"]:
+        return _error_response(UploadError(409, "Upload is not complete", received))
+
+    changes = {
+        field: value for field, value in (("prompt", body.prompt), ("rubric", body.rubric))
+        if value is not None and value != meta[field]
+    }
+    if changes and (meta.get("analysis_started") or upload_sessions.load_result(upload_id) is not None):
+        # The running (or finished) analysis used the stored values
+        raise HTTPException(
+            status_code=409,
+            detail="Analysis already started with a different prompt or rubric. Start a new upload to change them."
+        )
+
+    task = analysis_tasks.get((user['uid'], upload_id))
+    if task is None:
+        meta.update(changes)
+        if meta["prompt"] is None or meta["rubric"] is None:
+            raise HTTPException(status_code=400, detail="Prompt and rubric are required")
+        task = _start_analysis(meta)
+
+    try:
+        # Shielded so a dropped finalize does not throw away the analysis
+        result = await asyncio.shield(task)
+    except UploadError as e:
+        return _error_response(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing upload {upload_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while analyzing the speech."
+        )
+    return result
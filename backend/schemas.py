@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Literal
 
 
@@ -10,6 +10,20 @@ class WordTiming(BaseModel):
     confidence: float
 
 
+class WaveformLevel(BaseModel):
+    """One zoom level of the waveform: min/max pairs in the -127..127 range."""
+    samples_per_peak: int
+    min: List[int]
+    max: List[int]
+
+
+class WaveformPeaks(BaseModel):
+    """Precomputed waveform peaks, finest level first, so the player never decodes audio."""
+    sample_rate: int  # Rate of the decoded signal that samples_per_peak refers to
+    duration_ms: float
+    levels: List[WaveformLevel]
+
+
 class AnalyzeRequest(BaseModel):
     """Request schema for audio analysis endpoint."""
     prompt: str
@@ -41,6 +55,22 @@ class AnalyzeResponse(BaseModel):
     rubric_total: float
     rubric_max: float
     words: Optional[List[WordTiming]] = None  # Word-level timestamps for interactive transcript
+    peaks: Optional[WaveformPeaks] = None  # Waveform overview for the transcript player
+    transcript_key: Optional[str] = None  # Reuse the transcript later, e.g. for /api/rescore
+
+
+class AnalysisSummary(BaseModel):
+    """Returned by /api/analyze instead of the full result when the server saved it."""
+    recording_id: str
+    project_id: Optional[str] = None
+    audio_duration: float
+    wpm: int
+    filler_count: Dict[str, int]
+    clarity_score: float
+    pace_feedback: str
+    rubric_total: float
+    rubric_max: float
+    transcript_key: Optional[str] = None
 
 
 class ChatMessage(BaseModel):
@@ -53,7 +83,120 @@ class CoachRequest(BaseModel):
     rubric_feedback: Optional[str] = None
     chat_history: List[ChatMessage] = []
     user_question: str
+    latency_budget_ms: Optional[float] = None  # Lets the router pick a faster model tier
 
 
 class CoachResponse(BaseModel):
-    response: str
\ No newline at end of file
+    response: str
+
+class UploadSessionCreate(BaseModel):
+    """Starts a resumable upload. Prompt/rubric may be given now so analysis
+    can start as soon as the last chunk arrives."""
+    filename: str
+    content_type: str
+    total_size: int
+    sha256: Optional[str] = None  # Hex digest of the whole file, checked on completion
+    prompt: Optional[str] = None
+    rubric: Optional[str] = None
+
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    received: int  # Bytes stored so far; the next chunk starts here
+    total_size: int
+    complete: bool
+
+
+class UploadFinalizeRequest(BaseModel):
+    prompt: Optional[str] = None
+    rubric: Optional[str] = None
+
+
+class RescoreItem(BaseModel):
+    """
+    One stored draft to re-score. Send the stored `transcript`; a
+    `transcript_key` alone only works while the worker that transcribed the
+    audio still has it cached, so it is a best-effort shortcut.
+    """
+    recording_id: str
+    transcript: Optional[str] = None
+    transcript_key: Optional[str] = None
+
+
+class RescoreRequest(BaseModel):
+    prompt: str
+    rubric: str
+    recordings: List[RescoreItem]
+    latency_budget_ms: Optional[float] = None
+
+
+class RescoreResult(BaseModel):
+    """One line of the /api/rescore stream; `error` is set instead of scores on failure."""
+    recording_id: str
+    rubric_scores: Optional[Dict[str, RubricScore]] = None
+    rubric_total: Optional[float] = None
+    rubric_max: Optional[float] = None
+    ai_feedback: Optional[AIFeedback] = None
+    error: Optional[str] = None
+
+
+# Well above an hour of speech (~9000 words); bounds the cost of a draft diff
+MAX_DRAFT_WORDS = 20000
+
+
+class DraftWords(BaseModel):
+    """Stored word timings of one draft, as saved from an analysis."""
+    words: List[WordTiming] = Field(max_length=MAX_DRAFT_WORDS)
+    audio_duration: float  # Seconds
+
+
+class DraftDiffRequest(BaseModel):
+    base: DraftWords    # Earlier draft
+    target: DraftWords  # Later draft
+
+
+class DiffSpan(BaseModel):
+    """A run of kept, inserted or deleted words. Word ranges are [start, end)
+    indices; timestamps (ms) are given for each draft the span appears in."""
+    op: Literal["equal", "insert", "delete"]
+    base_start: int
+    base_end: int
+    target_start: int
+    target_end: int
+    text: str
+    base_start_ms: Optional[float] = None
+    base_end_ms: Optional[float] = None
+    target_start_ms: Optional[float] = None
+    target_end_ms: Optional[float] = None
+
+
+class DraftMetrics(BaseModel):
+    wpm: int
+    filler_count: Dict[str, int]
+    clarity_score: float
+
+
+class DraftDiffResponse(BaseModel):
+    spans: List[DiffSpan]
+    base_metrics: DraftMetrics
+    target_metrics: DraftMetrics
+    wpm_delta: int
+    filler_delta: Dict[str, int]  # target - base, per filler
+    clarity_delta: float
+
+
+class SearchHit(BaseModel):
+    """A matching segment of a past speech; word_start/word_end index its `words`."""
+    text: str
+    score: float
+    transcript_key: str
+    prompt: str
+    created_at: float
+    word_start: int
+    word_end: int
+    start_ms: float
+    end_ms: float
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
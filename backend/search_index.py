@@ -0,0 +1,259 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from analyze import normalize_word
+
+logger = logging.getLogger(__name__)
+
+# Per-user indexes live under here. This must be a persistent volume in
+# production; the rest of the backend keeps nothing on disk.
+index_dir = Path(os.getenv("SEARCH_INDEX_DIR", "data/search"))
+
+# Segments aim for this many words, breaking at sentence ends when possible
+SEGMENT_MIN_WORDS = 15
+SEGMENT_MAX_WORDS = 60
+
+VECTORS_FILE = "vectors.f32"     # float32 rows, appended
+SEGMENTS_FILE = "segments.jsonl"  # one JSON object per row, appended
+OFFSETS_FILE = "segments.idx"     # uint64 end offset of each row in SEGMENTS_FILE
+META_FILE = "meta.json"           # embedder name and dimension
+KEYS_FILE = "transcripts.txt"     # transcript_key of each indexed transcript, one per line
+LOCK_FILE = "append.lock"         # flock'd by the writer, across workers
+
+
+class Embedder:
+    """Turns texts into L2-normalized float32 vectors of size `dim`."""
+    name = "base"
+    dim = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder (feature hashing of words and word pairs).
+    No network or model needed; used for tests and local development.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = [w for w in (normalize_word(t) for t in text.split()) if w]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # Python's hash() is salted per process; blake2b is stable
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+class GeminiEmbedder(Embedder):
+    name = "gemini"
+    # The batch embedding endpoint takes at most this many texts per call
+    max_batch = 100
+
+    def __init__(self, model: str = "text-embedding-004", dim: int = 768):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        from gemini import client
+
+        values = []
+        for offset in range(0, len(texts), self.max_batch):
+            result = client.models.embed_content(model=self.model, contents=texts[offset:offset + self.max_batch])
+            values.extend(e.values for e in result.embeddings)
+        out = np.array(values, dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+def create_embedder() -> Embedder:
+    """Picks the embedder from SEARCH_EMBEDDER ("gemini" or "hashing")."""
+    name = os.getenv("SEARCH_EMBEDDER", "gemini")
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "gemini":
+        return GeminiEmbedder()
+    raise ValueError(f"Unknown SEARCH_EMBEDDER: {name}")
+
+
+def segment_words(words: list) -> list[dict]:
+    """
+    Groups word timings (dicts with text/start/end) into searchable
+    segments, each linked back to its [word_start, word_end) range.
+    """
+    segments = []
+    start = 0
+    for i, w in enumerate(words):
+        length = i - start + 1
+        sentence_end = re.search(r"[.!?]$", w['text']) is not None
+        if (sentence_end and length >= SEGMENT_MIN_WORDS) or length >= SEGMENT_MAX_WORDS or i == len(words) - 1:
+            segments.append({
+                "text": " ".join(x['text'] for x in words[start:i + 1]),
+                "word_start": start,
+                "word_end": i + 1,
+                "start_ms": words[start]['start'],
+                "end_ms": w['end'],
+            })
+            start = i + 1
+    return segments
+
+
+class SearchIndex:
+    """
+    Append-only vector index of one user's speech segments.
+
+    Vectors are raw float32 rows that are memory-mapped for queries, so a
+    query never loads the whole index into Python objects and an append
+    only writes the new rows. The offsets file is written last and defines
+    how many rows are committed; anything past it (from a crash mid-append)
+    is truncated before the next append.
+    """
+
+    def __init__(self, path: Path, embedder: Embedder):
+        self.path = path
+        self.embedder = embedder
+
+    def _committed_offsets(self) -> np.ndarray:
+        try:
+            return np.fromfile(self.path / OFFSETS_FILE, dtype=np.uint64)
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.uint64)
+
+    def _check_meta(self):
+        meta_path = self.path / META_FILE
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta["embedder"] != self.embedder.name or meta["dim"] != self.embedder.dim:
+                raise ValueError(
+                    f"Index at {self.path} was built with {meta['embedder']}/{meta['dim']}, "
+                    f"not {self.embedder.name}/{self.embedder.dim}"
+                )
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta_path.write_text(json.dumps({"embedder": self.embedder.name, "dim": self.embedder.dim}))
+
+    @contextmanager
+    def write_lock(self):
+        """Exclusive lock for appends, shared by all workers."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield  # Closing the file releases the lock
+
+    def has_transcript(self, transcript_key: str) -> bool:
+        try:
+            with open(self.path / KEYS_FILE) as f:
+                return any(line.rstrip("\n") == transcript_key for line in f)
+        except FileNotFoundError:
+            return False
+
+    def append(self, segments: list[dict], transcript_key: str):
+        """Appends one transcript's segments. Callers hold `write_lock`."""
+        if not segments:
+            return
+        self._check_meta()
+        vectors = self.embedder.embed([s["text"] for s in segments])
+
+        offsets = self._committed_offsets()
+        rows = len(offsets)
+        segments_end = int(offsets[-1]) if rows else 0
+        row_bytes = self.embedder.dim * 4
+
+        with open(self.path / VECTORS_FILE, "ab") as f:
+            f.truncate(rows * row_bytes)
+            f.write(vectors.astype(np.float32).tobytes())
+
+        new_offsets = []
+        with open(self.path / SEGMENTS_FILE, "ab") as f:
+            f.truncate(segments_end)
+            for segment in segments:
+                f.write((json.dumps(segment) + "\n").encode("utf-8"))
+                new_offsets.append(f.tell())
+
+        with open(self.path / OFFSETS_FILE, "ab") as f:
+            f.write(np.array(new_offsets, dtype=np.uint64).tobytes())
+
+        with open(self.path / KEYS_FILE, "a") as f:
+            f.write(transcript_key + "\n")
+
+    def query(self, text: str, k: int = 10) -> list[dict]:
+        offsets = self._committed_offsets()
+        rows = len(offsets)
+        if rows == 0:
+            return []
+        self._check_meta()
+
+        q = self.embedder.embed([text])[0]
+        vectors = np.memmap(self.path / VECTORS_FILE, dtype=np.float32, mode="r",
+                            shape=(rows, self.embedder.dim))
+        scores = vectors @ q
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = []
+        with open(self.path / SEGMENTS_FILE, "rb") as f:
+            for row in top:
+                start = int(offsets[row - 1]) if row else 0
+                f.seek(start)
+                segment = json.loads(f.read(int(offsets[row]) - start))
+                segment["score"] = float(scores[row])
+                hits.append(segment)
+        return hits
+
+
+_embedder: Optional[Embedder] = None
+
+
+def _user_index(uid: str) -> SearchIndex:
+    global _embedder
+    if _embedder is None:
+        _embedder = create_embedder()
+    # Hash the uid so it is always a safe directory name
+    user_key = hashlib.sha256(uid.encode("utf-8")).hexdigest()[:32]
+    return SearchIndex(index_dir / user_key, _embedder)
+
+
+def index_transcript(uid: str, transcript_key: str, words: list, prompt: str = ""):
+    """
+    Embeds a transcript's segments and appends them to the user's index.
+    Transcripts that are already indexed (e.g. analyzed again after the
+    transcript cache expired) are skipped.
+    """
+    segments = segment_words(words)
+    created_at = time.time()
+    for segment in segments:
+        segment.update(transcript_key=transcript_key, prompt=prompt, created_at=created_at)
+    index = _user_index(uid)
+    with index.write_lock():
+        if index.has_transcript(transcript_key):
+            logger.info("Transcript already indexed; skipping")
+            return
+        index.append(segments, transcript_key)
+    logger.info(f"Indexed {len(segments)} segments for search")
+
+
+def search(uid: str, text: str, k: int = 10) -> list[dict]:
+    # No lock: appends never touch committed rows, and the offsets file is
+    # only extended after the rows it points to are written.
+    return _user_index(uid).query(text, k)
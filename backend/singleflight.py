@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+# How often a waiter checks whether its client has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def request_key(*parts) -> str:
+    """Builds a stable coalescing key from strings/bytes (e.g. uid, audio, prompt)."""
+    h = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls.
+
+    The first caller for a key starts the computation; callers arriving with
+    the same key while it is running attach to it and receive the same result
+    (or exception). The computation is cancelled once every waiter has gone
+    away, either because its handler was cancelled or its client disconnected.
+    """
+
+    def __init__(self):
+        self.flights: dict[str, _Flight] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable], request: Optional[Request] = None):
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._forget(k, f))
+        flight.waiters += 1
+
+        watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+        try:
+            if watcher is None:
+                return await asyncio.shield(flight.task)
+            done, _ = await asyncio.wait({flight.task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if flight.task in done:
+                return flight.task.result()
+            # Our client disconnected; nobody will read this response.
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
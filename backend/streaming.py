@@ -0,0 +1,117 @@
+import asyncio
+import os
+import threading
+
+# Live audio is 16kHz, 16-bit mono PCM
+LIVE_SAMPLE_RATE = 16000
+BYTES_PER_SECOND = LIVE_SAMPLE_RATE * 2
+
+
+class StreamingTranscriber:
+    """
+    Interface for live transcription backends.
+
+    Audio frames go in through `send_audio`; finalized words come out of
+    `take_words` as dicts shaped like transcription['words'] entries
+    (text, start, end, confidence), each word returned exactly once.
+    """
+
+    async def connect(self):
+        pass
+
+    async def send_audio(self, frame: bytes):
+        raise NotImplementedError
+
+    def take_words(self) -> list:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class StubStreamingTranscriber(StreamingTranscriber):
+    """
+    Deterministic local backend for tests and development: emits one word
+    from a fixed script (fillers included) per `ms_per_word` of audio received.
+    """
+
+    SCRIPT = "so um today I want to talk about you know why practice like actually matters".split()
+
+    def __init__(self, ms_per_word: int = 400):
+        self.ms_per_word = ms_per_word
+        self.received_bytes = 0
+        self.emitted = 0
+        self.pending = []
+
+    async def send_audio(self, frame: bytes):
+        self.received_bytes += len(frame)
+        audio_ms = self.received_bytes * 1000 // BYTES_PER_SECOND
+        while (self.emitted + 1) * self.ms_per_word <= audio_ms:
+            start = self.emitted * self.ms_per_word
+            self.pending.append({
+                "text": self.SCRIPT[self.emitted % len(self.SCRIPT)],
+                "start": start,
+                "end": start + self.ms_per_word * 3 // 4,
+                "confidence": 0.9,
+            })
+            self.emitted += 1
+
+    def take_words(self) -> list:
+        words, self.pending = self.pending, []
+        return words
+
+
+class AssemblyAIStreamingTranscriber(StreamingTranscriber):
+    """AssemblyAI real-time transcription; final transcripts supply the words."""
+
+    def __init__(self, api_key: str):
+        import assemblyai as aai
+
+        aai.settings.api_key = api_key
+        self._aai = aai
+        self._lock = threading.Lock()
+        self._pending = []
+        self._error = None
+        self._transcriber = aai.RealtimeTranscriber(
+            sample_rate=LIVE_SAMPLE_RATE,
+            on_data=self._on_data,
+            on_error=self._on_error,
+        )
+
+    def _on_data(self, transcript):
+        # Called from the SDK's websocket thread
+        if isinstance(transcript, self._aai.RealtimeFinalTranscript) and transcript.words:
+            with self._lock:
+                self._pending.extend(
+                    {"text": w.text, "start": w.start, "end": w.end, "confidence": w.confidence}
+                    for w in transcript.words
+                )
+
+    def _on_error(self, error):
+        self._error = error
+
+    async def connect(self):
+        await asyncio.to_thread(self._transcriber.connect)
+
+    async def send_audio(self, frame: bytes):
+        if self._error is not None:
+            raise RuntimeError(f"Live transcription failed: {self._error}")
+        await asyncio.to_thread(self._transcriber.stream, frame)
+
+    def take_words(self) -> list:
+        with self._lock:
+            words, self._pending = self._pending, []
+        return words
+
+    async def close(self):
+        await asyncio.to_thread(self._transcriber.close)
+
+
+def create_streaming_transcriber() -> StreamingTranscriber:
+    """Picks the backend from LIVE_TRANSCRIBER ("assemblyai" or "stub")."""
+    backend = os.getenv("LIVE_TRANSCRIBER", "assemblyai")
+    if backend == "stub":
+        return StubStreamingTranscriber()
+    if backend == "assemblyai":
+        return AssemblyAIStreamingTranscriber(os.getenv("ASSEMBLYAI_API_KEY"))
+    raise ValueError(f"Unknown LIVE_TRANSCRIBER: {backend}")
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionController
+
+
+def _controller(**overrides):
+    limits = dict(global_slots=1, per_user=1, queue_size=32, rate_per_minute=600, burst=100, per_user_queue=4)
+    limits.update(overrides)
+    return AdmissionController(**limits)
+
+
+def test_rate_limit_rejects_with_retry_after():
+    async def run():
+        admission = _controller(global_slots=10, per_user=10, rate_per_minute=1, burst=2)
+        await admission.acquire("a")
+        await admission.acquire("a")
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("a")
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+        # Other users have their own bucket
+        await admission.acquire("b")
+
+    asyncio.run(run())
+
+
+def test_per_user_queue_cap_refunds_token():
+    async def run():
+        admission = _controller(per_user_queue=2)
+        await admission.acquire("a")
+        waiting = [asyncio.ensure_future(admission.acquire("a")) for _ in range(2)]
+        await asyncio.sleep(0)
+        tokens = admission.buckets["a"].tokens
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("a")
+        assert exc.value.status_code == 429
+        assert admission.buckets["a"].tokens == pytest.approx(tokens, abs=0.1)
+        assert admission.queued == 2
+        for w in waiting:
+            w.cancel()
+
+    asyncio.run(run())
+
+
+def test_full_queue_sheds_the_longest_user():
+    async def run():
+        admission = _controller(queue_size=3)
+        await admission.acquire("a")
+        heavy = [asyncio.ensure_future(admission.acquire("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        light = asyncio.ensure_future(admission.acquire("b"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert heavy[-1].done() and heavy[-1].exception().status_code == 429
+        assert not light.done()
+        assert admission.queued == 3
+        for w in heavy[:-1] + [light]:
+            w.cancel()
+
+    asyncio.run(run())
+
+
+def test_slots_are_handed_out_round_robin():
+    async def run():
+        admission = _controller(queue_size=32)
+        order = []
+
+        async def job(uid):
+            async with admission.slot(uid):
+                order.append(uid)
+                await asyncio.sleep(0)
+
+        await admission.acquire("holder")
+        # "a" queues a batch before "b" and "c" arrive
+        tasks = [asyncio.ensure_future(job("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(job("b")), asyncio.ensure_future(job("c"))]
+        await asyncio.sleep(0)
+        admission.release("holder")
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c", "a", "a"]
+        assert admission.active == 0 and admission.queued == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = _controller()
+        await admission.acquire("a")
+        waiter = asyncio.ensure_future(admission.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert admission.queued == 0 and not admission.waiting
+        admission.release("a")
+        assert admission.active == 0
+
+    asyncio.run(run())
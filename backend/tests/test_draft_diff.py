@@ -0,0 +1,59 @@
+import random
+
+import draft_diff
+from draft_diff import diff_sequences
+
+
+def _lcs_length(a, b):
+    prev = [0] * (len(b) + 1)
+    for x in a:
+        cur = [0]
+        for j, y in enumerate(b):
+            cur.append(prev[j] + 1 if x == y else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+def _apply(ops, a, b):
+    """Checks the script covers both sequences in order and rebuilds b."""
+    out, i, j = [], 0, 0
+    for kind, a_lo, a_hi, b_lo, b_hi in ops:
+        assert (a_lo, b_lo) == (i, j)
+        if kind == "equal":
+            assert a[a_lo:a_hi] == b[b_lo:b_hi]
+            out += a[a_lo:a_hi]
+        elif kind == "insert":
+            assert a_lo == a_hi
+            out += b[b_lo:b_hi]
+        else:
+            assert kind == "delete" and b_lo == b_hi
+        i, j = a_hi, b_hi
+    assert (i, j) == (len(a), len(b))
+    return out
+
+
+def test_matches_lcs_oracle():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = [rng.randint(0, 4) for _ in range(rng.randint(0, 12))]
+        b = [rng.randint(0, 4) for _ in range(rng.randint(0, 12))]
+        ops = diff_sequences(a, b)
+        assert _apply(ops, a, b) == b
+        kept = sum(op[2] - op[1] for op in ops if op[0] == "equal")
+        assert kept == _lcs_length(a, b), (a, b, ops)
+
+
+def test_edit_cap_still_produces_valid_script(monkeypatch):
+    monkeypatch.setattr(draft_diff, "MAX_EDIT_DISTANCE", 3)
+    rng = random.Random(1)
+    a = [rng.randint(0, 9) for _ in range(40)]
+    b = [rng.randint(0, 9) for _ in range(40)]
+    assert _apply(diff_sequences(a, b), a, b) == b
+
+
+def test_anchored_diff_still_produces_valid_script(monkeypatch):
+    monkeypatch.setattr(draft_diff, "ANCHOR_THRESHOLD", 10)
+    rng = random.Random(2)
+    a = [rng.randint(0, 30) for _ in range(60)]
+    b = a[:20] + [rng.randint(0, 30) for _ in range(10)] + a[25:]
+    assert _apply(diff_sequences(a, b), a, b) == b
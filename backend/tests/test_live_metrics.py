@@ -0,0 +1,65 @@
+import asyncio
+
+from analyze import FILLERS, LiveMetrics, check_fillers, normalize_word
+from streaming import BYTES_PER_SECOND, StubStreamingTranscriber
+
+# 100ms of 16kHz 16-bit mono PCM
+FRAME = b"\0" * (BYTES_PER_SECOND // 10)
+
+
+def _stream(seconds, window_ms, take_every=3):
+    """Feeds `seconds` of audio through the stub, updating metrics every few frames."""
+    transcriber = StubStreamingTranscriber(ms_per_word=400)
+    metrics = LiveMetrics(window_ms=window_ms)
+    words = []
+
+    async def run():
+        for i in range(seconds * 10):
+            await transcriber.send_audio(FRAME)
+            if i % take_every == 0:
+                new = transcriber.take_words()
+                words.extend(new)
+                metrics.add_words(new)
+        new = transcriber.take_words()
+        words.extend(new)
+        metrics.add_words(new)
+
+    asyncio.run(run())
+    return metrics, words
+
+
+def _window_fillers(words, first):
+    """Fillers of words[first:], with a two-word filler counted at its second word."""
+    counts = {}
+    tokens = [normalize_word(w["text"]) for w in words]
+    for i in range(first, len(tokens)):
+        found = [tokens[i]] if tokens[i] in FILLERS else []
+        if i and f"{tokens[i - 1]} {tokens[i]}" in FILLERS:
+            found.append(f"{tokens[i - 1]} {tokens[i]}")
+        for f in found:
+            counts[f] = counts.get(f, 0) + 1
+    return counts
+
+
+def test_window_matches_full_recount():
+    metrics, words = _stream(seconds=20, window_ms=5000)
+    snapshot = metrics.snapshot()
+    assert snapshot["word_count"] == len(words) == 50
+
+    # The window keeps words ending within window_ms of the newest word
+    cutoff = words[-1]["end"] - 5000
+    first = next(i for i, w in enumerate(words) if w["end"] >= cutoff)
+    in_window = words[first:]
+    assert first > 0
+    assert snapshot["filler_count"] == _window_fillers(words, first)
+    assert snapshot["total_filler_count"] == check_fillers({"words": words})
+    span_ms = in_window[-1]["end"] - in_window[0]["start"]
+    assert snapshot["wpm"] == round(len(in_window) / (span_ms / 60000))
+    assert snapshot["clarity_score"] == 9.0
+
+
+def test_empty_snapshot():
+    snapshot = LiveMetrics().snapshot()
+    assert snapshot["wpm"] == 0
+    assert snapshot["pace_feedback"] is None
+    assert snapshot["word_count"] == 0
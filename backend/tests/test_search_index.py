@@ -0,0 +1,52 @@
+from search_index import VECTORS_FILE, HashingEmbedder, SearchIndex, segment_words
+
+
+def _segments(transcript_key, *sentences):
+    segments, word = [], 0
+    for text in sentences:
+        count = len(text.split())
+        segments.append({
+            "text": text, "word_start": word, "word_end": word + count,
+            "start_ms": word * 300, "end_ms": (word + count) * 300, "transcript_key": transcript_key,
+        })
+        word += count
+    return segments
+
+
+def test_append_then_query(tmp_path):
+    index = SearchIndex(tmp_path / "index", HashingEmbedder(dim=64))
+    assert index.query("anything") == []
+
+    index.append(_segments("t1", "Practice makes the talk better.", "Slides should be simple and readable."), "t1")
+    index.append(_segments("t2", "Budget numbers went up this quarter."), "t2")
+
+    hits = index.query("simple readable slides", k=2)
+    assert len(hits) == 2
+    assert hits[0]["text"] == "Slides should be simple and readable."
+    assert hits[0]["transcript_key"] == "t1"
+    assert (hits[0]["word_start"], hits[0]["word_end"]) == (5, 11)
+    assert hits[0]["score"] >= hits[1]["score"]
+
+    assert index.query("budget quarter", k=1)[0]["transcript_key"] == "t2"
+    assert len(index.query("anything", k=10)) == 3
+    assert index.has_transcript("t1") and index.has_transcript("t2")
+    assert not index.has_transcript("t3")
+
+
+def test_uncommitted_rows_are_truncated(tmp_path):
+    index = SearchIndex(tmp_path / "index", HashingEmbedder(dim=64))
+    index.append(_segments("t1", "One short sentence."), "t1")
+    # A crash mid-append leaves vector bytes past the committed offsets
+    with open(tmp_path / "index" / VECTORS_FILE, "ab") as f:
+        f.write(b"\0" * 64 * 4 * 3)
+    index.append(_segments("t2", "Another sentence here."), "t2")
+    hits = index.query("another sentence", k=10)
+    assert [h["transcript_key"] for h in hits] == ["t2", "t1"]
+
+
+def test_segment_words_covers_every_word():
+    words = [{"text": f"w{i}." if i % 20 == 19 else f"w{i}", "start": i * 300, "end": i * 300 + 250} for i in range(130)]
+    segments = segment_words(words)
+    assert segments[0]["word_start"] == 0 and segments[-1]["word_end"] == 130
+    assert all(a["word_end"] == b["word_start"] for a, b in zip(segments, segments[1:]))
+    assert [s["word_end"] - s["word_start"] for s in segments] == [20, 20, 20, 20, 20, 20, 10]
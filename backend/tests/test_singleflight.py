@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def test_request_key_is_length_prefixed():
+    assert request_key("ab", "c") != request_key("a", "bc")
+    assert request_key("u", b"audio", None) == request_key("u", b"audio", None)
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert not flights.flights
+
+    asyncio.run(run())
+
+
+def test_work_continues_while_any_waiter_remains():
+    async def run():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flights.do("k", work))
+        second = asyncio.ensure_future(flights.do("k", work))
+        await started.wait()
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(run())
+
+
+def test_work_is_cancelled_once_every_waiter_leaves():
+    async def run():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(flights.do("k", work)) for _ in range(2)]
+        await started.wait()
+        for w in waiters:
+            w.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert not flights.flights
+
+        # A new caller starts a fresh computation instead of the cancelled one
+        async def again():
+            return "fresh"
+        assert await flights.do("k", again) == "fresh"
+
+    asyncio.run(run())
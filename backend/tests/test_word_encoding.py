@@ -0,0 +1,42 @@
+import random
+
+import word_encoding
+from word_encoding import decode_words, encode_words
+
+
+def _words(n, seed=0):
+    rng = random.Random(seed)
+    words, t = [], 0
+    for i in range(n):
+        start = t + rng.randint(0, 400)
+        end = start + rng.randint(0, 900)
+        words.append({"text": f"w{i}", "start": start, "end": end, "confidence": rng.randint(0, 255) / 255})
+        t = start
+    return words
+
+
+def test_round_trip_across_chunks(monkeypatch):
+    monkeypatch.setattr(word_encoding, "WORDS_PER_CHUNK", 7)
+    words = _words(50)
+    chunks = encode_words(words)
+    assert len(chunks) == 8
+    # Firestore returns the subcollection in no particular order
+    random.Random(1).shuffle(chunks)
+    assert decode_words(chunks) == words
+
+
+def test_overlapping_and_out_of_order_starts():
+    # Negative deltas are zigzag-encoded, large gaps span several varint bytes
+    words = [
+        {"text": "a", "start": 5000, "end": 5200, "confidence": 1.0},
+        {"text": "b", "start": 4900, "end": 5100, "confidence": 0.0},
+        {"text": "c", "start": 10_000_000, "end": 10_000_001, "confidence": 0.5},
+    ]
+    decoded = decode_words(encode_words(words))
+    assert [(w["text"], w["start"], w["end"]) for w in decoded] == [(w["text"], w["start"], w["end"]) for w in words]
+    assert [round(w["confidence"] * 255) for w in decoded] == [255, 0, 128]
+
+
+def test_empty():
+    assert encode_words([]) == []
+    assert decode_words([]) == []
@@ -0,0 +1,253 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Resumable upload sessions live on local disk: temp/uploads/<upload_id>/
+uploads_dir = Path("temp") / "uploads"
+uploads_dir.mkdir(parents=True, exist_ok=True)
+
+# Sessions untouched for this long are removed by the janitor
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", "3600"))
+UPLOAD_JANITOR_INTERVAL = int(os.getenv("UPLOAD_JANITOR_INTERVAL", "300"))
+# Unfinished sessions one user may hold at once; each can claim MAX_FILE_SIZE of disk
+UPLOAD_MAX_SESSIONS_PER_USER = int(os.getenv("UPLOAD_MAX_SESSIONS_PER_USER", "3"))
+
+META_FILE = "meta.json"
+DATA_FILE = "data.part"
+RESULT_FILE = "result.json"         # analysis result, kept until the session expires
+WRITE_LOCK_FILE = "write.lock"      # flock'd while a chunk is appended
+ANALYSIS_LOCK_FILE = "analysis.lock"  # flock'd by the worker analyzing the upload
+CREATE_LOCK_FILE = ".create.lock"   # in uploads_dir; serializes the per-user session cap
+
+
+class UploadError(Exception):
+    """Raised for protocol violations; `status_code` maps to the HTTP response."""
+
+    def __init__(self, status_code: int, detail: str, received: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.received = received
+
+
+def _session_dir(upload_id: str) -> Path:
+    # upload ids are uuid4 hex; refuse anything else so ids cannot escape uploads_dir
+    if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+        raise UploadError(404, "Upload session not found")
+    return uploads_dir / upload_id
+
+
+def _open_sessions(uid: str) -> int:
+    """Sessions of `uid` that still hold (or are waiting for) audio."""
+    count = 0
+    for session_dir in uploads_dir.iterdir():
+        try:
+            meta = json.loads((session_dir / META_FILE).read_text())
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            continue
+        if meta["uid"] == uid and not (session_dir / RESULT_FILE).exists():
+            count += 1
+    return count
+
+
+def create_session(uid: str, filename: str, content_type: str, total_size: int,
+                   sha256: Optional[str] = None, prompt: Optional[str] = None,
+                   rubric: Optional[str] = None) -> dict:
+    """Creates a session, or raises 429 if the user has too many open ones."""
+    with open(uploads_dir / CREATE_LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _open_sessions(uid) >= UPLOAD_MAX_SESSIONS_PER_USER:
+            raise UploadError(429, "Too many uploads in progress. Finish or wait for one to expire.")
+        upload_id = uuid.uuid4().hex
+        session_dir = uploads_dir / upload_id
+        session_dir.mkdir()
+        meta = {
+            "upload_id": upload_id,
+            "uid": uid,
+            "filename": filename,
+            "content_type": content_type,
+            "total_size": total_size,
+            "sha256": sha256.lower() if sha256 else None,
+            "prompt": prompt,
+            "rubric": rubric,
+            "created_at": time.time(),
+            "analysis_started": False,
+        }
+        (session_dir / META_FILE).write_text(json.dumps(meta))
+    (session_dir / DATA_FILE).touch()
+    return meta
+
+
+def load_session(upload_id: str, uid: str) -> dict:
+    """Returns the session metadata, or raises 404 if missing or owned by someone else."""
+    meta_path = _session_dir(upload_id) / META_FILE
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        raise UploadError(404, "Upload session not found")
+    if meta["uid"] != uid:
+        raise UploadError(404, "Upload session not found")
+    return meta
+
+
+def update_session(meta: dict):
+    (_session_dir(meta["upload_id"]) / META_FILE).write_text(json.dumps(meta))
+
+
+def data_path(upload_id: str) -> Path:
+    return _session_dir(upload_id) / DATA_FILE
+
+
+def received_bytes(upload_id: str) -> int:
+    """The data file on disk is the source of truth for how much has arrived."""
+    try:
+        return data_path(upload_id).stat().st_size
+    except FileNotFoundError:
+        pass
+    # The audio is dropped once analyzed; the upload was complete then
+    try:
+        if (_session_dir(upload_id) / RESULT_FILE).exists():
+            return json.loads((_session_dir(upload_id) / META_FILE).read_text())["total_size"]
+    except FileNotFoundError:
+        pass
+    raise UploadError(404, "Upload session not found")
+
+
+@contextmanager
+def _session_flock(upload_id: str, name: str, blocking: bool = True):
+    """
+    Exclusive lock on a file in the session directory, shared by all
+    workers. Yields False instead of blocking when `blocking` is off and
+    another holder has it.
+    """
+    try:
+        fd = os.open(_session_dir(upload_id) / name, os.O_CREAT | os.O_RDWR)
+    except FileNotFoundError:
+        raise UploadError(404, "Upload session not found")
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)  # Also releases the lock
+
+
+def analysis_lock(upload_id: str):
+    """Context manager yielding whether this process may analyze the upload."""
+    return _session_flock(upload_id, ANALYSIS_LOCK_FILE, blocking=False)
+
+
+def save_result(upload_id: str, result_json: str):
+    """Stores the analysis result and drops the audio, which is no longer needed."""
+    session_dir = _session_dir(upload_id)
+    tmp = session_dir / f".{RESULT_FILE}.{uuid.uuid4().hex}"
+    tmp.write_text(result_json)
+    os.replace(tmp, session_dir / RESULT_FILE)
+    data_path(upload_id).unlink(missing_ok=True)
+    os.utime(session_dir / META_FILE)  # the result is kept for a full TTL
+
+
+def load_result(upload_id: str) -> Optional[str]:
+    try:
+        return (_session_dir(upload_id) / RESULT_FILE).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def write_chunk(meta: dict, offset: int, chunk: bytes, chunk_sha256: Optional[str] = None) -> int:
+    """
+    Appends `chunk`, which the client says starts at `offset`, and returns the
+    new received byte count.
+
+    A chunk that overlaps bytes we already have (a retry after a lost
+    response) only contributes its unseen tail. A chunk that would leave a
+    gap is rejected with 409 and the current offset. Writes to a session are
+    serialized across workers with a file lock.
+    """
+    if offset < 0:
+        raise UploadError(400, "Chunk offset must not be negative")
+    if chunk_sha256 and hashlib.sha256(chunk).hexdigest() != chunk_sha256.lower():
+        raise UploadError(422, "Chunk checksum mismatch")
+
+    with _session_flock(meta["upload_id"], WRITE_LOCK_FILE):
+        return _write_chunk_locked(meta, offset, chunk)
+
+
+def _write_chunk_locked(meta: dict, offset: int, chunk: bytes) -> int:
+    upload_id = meta["upload_id"]
+    received = received_bytes(upload_id)
+    if offset > received:
+        raise UploadError(409, "Chunk offset is past the received range", received)
+    if offset + len(chunk) > meta["total_size"]:
+        raise UploadError(413, "Chunk extends past the declared upload size", received)
+
+    tail = chunk[received - offset:]
+    if tail:
+        with open(data_path(upload_id), "ab") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        received += len(tail)
+        os.utime(_session_dir(upload_id) / META_FILE)  # keep the session alive for the janitor
+
+    if tail and received == meta["total_size"] and meta["sha256"]:
+        if file_sha256(data_path(upload_id)) != meta["sha256"]:
+            # Start over rather than analyzing corrupt audio
+            open(data_path(upload_id), "wb").close()
+            raise UploadError(422, "Upload checksum mismatch; please re-upload", 0)
+    return received
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def delete_session(upload_id: str):
+    shutil.rmtree(uploads_dir / upload_id, ignore_errors=True)
+
+
+def sweep_expired_sessions(now: Optional[float] = None) -> int:
+    """Removes sessions whose metadata has not been touched within the TTL."""
+    now = now or time.time()
+    removed = 0
+    for session_dir in uploads_dir.iterdir():
+        if not session_dir.is_dir():
+            continue
+        try:
+            last_touched = (session_dir / META_FILE).stat().st_mtime
+        except FileNotFoundError:
+            last_touched = session_dir.stat().st_mtime
+        if now - last_touched > UPLOAD_SESSION_TTL:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+async def run_upload_janitor():
+    """Background loop started from the app lifespan."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(sweep_expired_sessions)
+            if removed:
+                logger.info(f"Upload janitor removed {removed} expired session(s)")
+        except Exception as e:
+            logger.error(f"Upload janitor failed: {e}", exc_info=True)
+        await asyncio.sleep(UPLOAD_JANITOR_INTERVAL)
@@ -0,0 +1,144 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Decode to 8kHz mono: plenty for drawing a waveform, and cheap to scan
+PEAK_SAMPLE_RATE = 8000
+# Finest level: one min/max pair per 64 samples (8ms at 8kHz)
+BASE_SAMPLES_PER_PEAK = 64
+# Each coarser level merges this many peaks of the level below
+LEVEL_FACTOR = 4
+# Skip levels that would be too large to ship as JSON; coarser ones remain
+MAX_PEAKS_PER_LEVEL = 16384
+# Stop once a level is small enough to draw a whole-file overview
+MIN_PEAKS_PER_LEVEL = 256
+
+READ_BLOCK_BYTES = 256 * 1024
+# ffmpeg is killed if decoding takes longer than this (seconds)
+PEAKS_DECODE_TIMEOUT = float(os.getenv("PEAKS_DECODE_TIMEOUT", "60"))
+# Only this much of ffmpeg's stderr is logged on failure
+STDERR_LOG_BYTES = 2048
+
+
+def _decode_command(audio_path: str) -> list[str]:
+    return [
+        "ffmpeg", "-v", "error", "-nostdin",
+        "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(PEAK_SAMPLE_RATE),
+        "-",
+    ]
+
+
+def _reduce(mins: np.ndarray, maxs: np.ndarray, factor: int) -> tuple[np.ndarray, np.ndarray]:
+    """Merges every `factor` consecutive peaks (the last group may be short)."""
+    pad = (-len(mins)) % factor
+    if pad:
+        mins = np.concatenate([mins, np.full(pad, mins[-1], dtype=mins.dtype)])
+        maxs = np.concatenate([maxs, np.full(pad, maxs[-1], dtype=maxs.dtype)])
+    return mins.reshape(-1, factor).min(axis=1), maxs.reshape(-1, factor).max(axis=1)
+
+
+def compute_peaks(audio_path: str) -> Optional[dict]:
+    """
+    Decodes the audio once with ffmpeg and returns multi-resolution min/max
+    peaks, quantized to -127..127, for the interactive transcript player:
+
+        {"sample_rate": 8000, "duration_ms": ..., "levels": [
+            {"samples_per_peak": 64, "min": [...], "max": [...]}, ...]}
+
+    Levels go from finest to coarsest. Returns None if ffmpeg is unavailable,
+    the file cannot be decoded or decoding exceeds PEAKS_DECODE_TIMEOUT;
+    peaks are a nice-to-have.
+    """
+    if shutil.which("ffmpeg") is None:
+        logger.warning("ffmpeg not found on PATH; skipping waveform peaks")
+        return None
+
+    mins: list[np.ndarray] = []
+    maxs: list[np.ndarray] = []
+    leftover = np.empty(0, dtype=np.int16)
+    total_samples = 0
+
+    # stderr goes to a file, not a pipe: a corrupt file can log more than a
+    # pipe buffer holds, and ffmpeg would block writing it while we read stdout
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(_decode_command(audio_path), stdout=subprocess.PIPE, stderr=stderr_file)
+    watchdog = threading.Timer(PEAKS_DECODE_TIMEOUT, proc.kill)
+    watchdog.start()
+    try:
+        carry = b""
+        while True:
+            data = proc.stdout.read(READ_BLOCK_BYTES)
+            if not data:
+                break
+            data = carry + data
+            # int16 samples are 2 bytes; keep an odd trailing byte for next read
+            usable = len(data) - (len(data) % 2)
+            carry = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+            total_samples += len(samples)
+
+            samples = np.concatenate([leftover, samples]) if len(leftover) else samples
+            whole = len(samples) - (len(samples) % BASE_SAMPLES_PER_PEAK)
+            blocks = samples[:whole].reshape(-1, BASE_SAMPLES_PER_PEAK)
+            if len(blocks):
+                mins.append(blocks.min(axis=1))
+                maxs.append(blocks.max(axis=1))
+            leftover = samples[whole:].copy()
+
+        proc.wait()
+        timed_out = not watchdog.is_alive()
+        stderr_file.seek(0)
+        stderr = stderr_file.read(STDERR_LOG_BYTES)
+    finally:
+        watchdog.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        stderr_file.close()
+
+    if timed_out:
+        logger.warning(f"ffmpeg took longer than {PEAKS_DECODE_TIMEOUT:.0f}s decoding {audio_path}; skipping peaks")
+        return None
+    if proc.returncode != 0:
+        logger.warning(f"ffmpeg could not decode {audio_path}: {stderr.decode(errors='replace').strip()}")
+        return None
+
+    if len(leftover):
+        mins.append(leftover.min(keepdims=True))
+        maxs.append(leftover.max(keepdims=True))
+    if not mins:
+        return None
+
+    # int16 -> int8 range keeps the payload small; plenty for drawing
+    level_min = (np.concatenate(mins).astype(np.int32) >> 8).clip(-127, 127).astype(np.int8)
+    level_max = (np.concatenate(maxs).astype(np.int32) >> 8).clip(-127, 127).astype(np.int8)
+
+    levels = []
+    samples_per_peak = BASE_SAMPLES_PER_PEAK
+    while True:
+        if len(level_min) <= MAX_PEAKS_PER_LEVEL:
+            levels.append({
+                "samples_per_peak": samples_per_peak,
+                "min": level_min.tolist(),
+                "max": level_max.tolist(),
+            })
+        if len(level_min) <= MIN_PEAKS_PER_LEVEL:
+            break
+        level_min, level_max = _reduce(level_min, level_max, LEVEL_FACTOR)
+        samples_per_peak *= LEVEL_FACTOR
+
+    return {
+        "sample_rate": PEAK_SAMPLE_RATE,
+        "duration_ms": total_samples * 1000 / PEAK_SAMPLE_RATE,
+        "levels": levels,
+    }
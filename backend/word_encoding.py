@@ -0,0 +1,73 @@
+import os
+
+# Chunked word timing encoding for recordings stored in Firestore. Kept
+# free of Firebase imports so it can be used and tested on its own.
+
+# Words per chunk document. Encoded words take ~6-12 bytes each, so this
+# stays far below Firestore's 1 MiB document limit.
+WORDS_PER_CHUNK = int(os.getenv("WORDS_PER_CHUNK", "5000"))
+
+# Compact word timing encoding (chunked-v1). Each chunk document holds:
+#   texts        words joined with "\n" (ASR words never contain newlines)
+#   starts       start times in ms, delta-encoded from the previous word
+#                (the first from 0) as zigzag LEB128 varints
+#   durations    end - start in ms, zigzag LEB128 varints
+#   confidences  one byte per word, confidence * 255 rounded
+# Times are rounded to whole milliseconds (AssemblyAI reports integers).
+
+
+def _put_varint(out: bytearray, value: int):
+    value = (value << 1) ^ (value >> 63)  # zigzag: small negatives stay small
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes) -> list[int]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append((value >> 1) ^ -(value & 1))
+            value = shift = 0
+    return values
+
+
+def encode_words(words: list) -> list[dict]:
+    """Encodes word timings (dicts with text/start/end/confidence) into chunk documents."""
+    chunks = []
+    for index, offset in enumerate(range(0, len(words), WORDS_PER_CHUNK)):
+        part = words[offset:offset + WORDS_PER_CHUNK]
+        starts, durations = bytearray(), bytearray()
+        previous = 0
+        for w in part:
+            start = round(w['start'])
+            _put_varint(starts, start - previous)
+            _put_varint(durations, round(w['end']) - start)
+            previous = start
+        chunks.append({
+            "index": index,
+            "count": len(part),
+            "texts": "\n".join(w['text'] for w in part),
+            "starts": bytes(starts),
+            "durations": bytes(durations),
+            "confidences": bytes(min(255, max(0, round(w['confidence'] * 255))) for w in part),
+        })
+    return chunks
+
+
+def decode_words(chunks: list[dict]) -> list[dict]:
+    """Inverse of encode_words; chunks may arrive in any order."""
+    words = []
+    for chunk in sorted(chunks, key=lambda c: c['index']):
+        texts = chunk['texts'].split("\n") if chunk['count'] else []
+        start = 0
+        for text, delta, duration, confidence in zip(
+            texts, _read_varints(chunk['starts']), _read_varints(chunk['durations']), chunk['confidences']
+        ):
+            start += delta
+            words.append({"text": text, "start": start, "end": start + duration, "confidence": confidence / 255})
+    return words